@@ -0,0 +1,352 @@
+"""Benchmark for the Cash Flow Forecast report.
+
+Generates a reproducible synthetic dataset and measures the time, query count
+and peak memory of every stage of `CashFlowForecast`, using its debug mode.
+
+Only use this on a throwaway site: the synthetic documents are written directly
+into the database, bypassing validations.
+"""
+
+import json
+import random
+import tracemalloc
+
+import frappe
+from frappe.utils import add_days, add_months, flt, get_first_day, get_last_day, getdate, now
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	CashFlowForecast,
+)
+
+PREFIX = "BENCH"
+
+# Owner of the synthetic documents, by which they are found again. Names could
+# collide with real documents, but `.invalid` is never the domain of a user.
+OWNER = "benchmark@example.invalid"
+
+DEFAULT_SIZES = {
+	"companies": 2,
+	"currencies": 3,
+	"orders": 10000,
+	"invoices": 20000,
+	"auto_repeats": 200,
+	"employees": 500,
+	"expense_claims": 5000,
+}
+
+CURRENCIES = ["EUR", "USD", "GBP", "CHF", "CAD", "JPY", "SEK", "NOK", "DKK", "PLN"]
+
+# Doctypes written by `generate_data`, in the order they are deleted
+DOCTYPES = [
+	"Auto Repeat",
+	"Sales Order",
+	"Purchase Order",
+	"Sales Invoice",
+	"Purchase Invoice",
+	"Expense Claim",
+	"Employee",
+	"Currency Exchange",
+	"Company",
+]
+
+
+def generate_data(seed=0, months=12, presentation_currency="EUR", **sizes):
+	"""Insert a synthetic dataset of the given sizes, spread over `months` before and after today."""
+	sizes = {**DEFAULT_SIZES, **{key: value for key, value in sizes.items() if value is not None}}
+	rng = random.Random(seed)
+
+	delete_data()
+
+	start_date = getdate(add_months(get_first_day(getdate()), -months))
+	days = (getdate(add_months(start_date, 2 * months)) - start_date).days
+
+	def random_date():
+		return add_days(start_date, rng.randrange(days))
+
+	def random_amount():
+		return round(rng.uniform(100, 10000), 2)
+
+	currencies = [presentation_currency] + [
+		currency for currency in CURRENCIES if currency != presentation_currency
+	][: sizes["currencies"] - 1]
+	companies = [f"{PREFIX} Company {i}" for i in range(sizes["companies"])]
+
+	insert(
+		"Company",
+		["company_name", "abbr", "default_currency"],
+		[
+			(company, company, f"{PREFIX}{i}", currencies[i % len(currencies)])
+			for i, company in enumerate(companies)
+		],
+	)
+
+	insert(
+		"Currency Exchange",
+		["date", "from_currency", "to_currency", "exchange_rate", "for_buying", "for_selling"],
+		[
+			(
+				f"{PREFIX}-{currency}",
+				getdate(),
+				presentation_currency,
+				currency,
+				round(rng.uniform(0.5, 2), 4),
+				1,
+				1,
+			)
+			for currency in currencies[1:]
+		],
+	)
+
+	for doctype, abbr, date_field in (
+		("Sales Order", "SO", "delivery_date"),
+		("Purchase Order", "PO", "schedule_date"),
+	):
+		rows = []
+		for i in range(sizes["orders"] // 2):
+			transaction_date = random_date()
+			rows.append(
+				(
+					f"{PREFIX}-{abbr}-{i:07d}",
+					rng.choice(companies),
+					transaction_date,
+					add_days(transaction_date, rng.randrange(60)),
+					"To Deliver and Bill",
+					rng.choice(currencies),
+					random_amount(),
+					rng.choice([0, 0, 50, 100]),
+				)
+			)
+
+		insert(
+			doctype,
+			[
+				"company",
+				"transaction_date",
+				date_field,
+				"status",
+				"currency",
+				"grand_total",
+				"per_billed",
+			],
+			rows,
+			docstatus=1,
+		)
+
+		insert(
+			"Auto Repeat",
+			[
+				"reference_doctype",
+				"reference_document",
+				"start_date",
+				"end_date",
+				"frequency",
+				"status",
+			],
+			[
+				(
+					f"{PREFIX}-AR-{abbr}-{i:05d}",
+					doctype,
+					f"{PREFIX}-{abbr}-{i:07d}",
+					start_date,
+					add_months(start_date, 2 * months) if i % 2 else None,
+					rng.choice(["Monthly", "Quarterly", "Yearly"]),
+					"Active",
+				)
+				for i in range(min(sizes["auto_repeats"] // 2, sizes["orders"] // 2))
+			],
+		)
+
+	for doctype, abbr in (("Sales Invoice", "SI"), ("Purchase Invoice", "PI")):
+		rows = []
+		for i in range(sizes["invoices"] // 2):
+			grand_total = random_amount()
+			due_date = random_date()
+			rows.append(
+				(
+					f"{PREFIX}-{abbr}-{i:07d}",
+					rng.choice(companies),
+					add_days(due_date, -30),
+					due_date,
+					"Unpaid",
+					rng.choice(currencies),
+					grand_total,
+					grand_total,
+				)
+			)
+
+		insert(
+			doctype,
+			[
+				"company",
+				"posting_date",
+				"due_date",
+				"status",
+				"currency",
+				"grand_total",
+				"outstanding_amount",
+			],
+			rows,
+			docstatus=1,
+		)
+
+	rows = []
+	for i in range(sizes["employees"]):
+		date_of_joining = add_days(start_date, -rng.randrange(5 * 365))
+		relieving_date = random_date() if rng.random() < 0.2 else None
+		rows.append(
+			(
+				f"{PREFIX}-EMP-{i:06d}",
+				rng.choice(companies),
+				f"{PREFIX} Employee {i}",
+				f"{PREFIX} Employee {i}",
+				"Active",
+				date_of_joining,
+				max(relieving_date, date_of_joining) if relieving_date else None,
+				round(rng.uniform(2000, 9000), 2),
+				rng.choice(currencies),
+			)
+		)
+
+	insert(
+		"Employee",
+		[
+			"company",
+			"first_name",
+			"employee_name",
+			"status",
+			"date_of_joining",
+			"relieving_date",
+			"ctc",
+			"salary_currency",
+		],
+		rows,
+	)
+
+	insert(
+		"Expense Claim",
+		["company", "posting_date", "status", "approval_status", "total_claimed_amount"],
+		[
+			(
+				f"{PREFIX}-EXP-{i:07d}",
+				rng.choice(companies),
+				random_date(),
+				"Unpaid",
+				"Approved",
+				round(rng.uniform(10, 1000), 2),
+			)
+			for i in range(sizes["expense_claims"])
+		],
+		docstatus=1,
+	)
+
+	frappe.db.commit()
+
+
+def delete_data():
+	"""Delete all documents created by `generate_data`."""
+	for doctype in DOCTYPES:
+		table = frappe.qb.DocType(doctype)
+		frappe.qb.from_(table).delete().where(table.owner == OWNER).run()
+
+	frappe.db.commit()
+
+
+def insert(doctype, fields, rows, docstatus=0):
+	"""Bulk insert `rows`, each starting with the name followed by the values of `fields`."""
+	timestamp = now()
+	frappe.db.bulk_insert(
+		doctype,
+		fields=["name", "creation", "modified", "owner", "modified_by", "docstatus", *fields],
+		values=[
+			(name, timestamp, timestamp, OWNER, OWNER, docstatus, *values)
+			for name, *values in rows
+		],
+	)
+
+
+def run_benchmark(output=None, months=12, periodicity="Monthly", presentation_currency="EUR"):
+	"""Run the forecast for the next `months` and return the measurements.
+
+	The measurements are written to `output` as JSON, if given.
+	"""
+	period_start_date = get_first_day(getdate())
+	filters = frappe._dict(
+		company=None,
+		filter_based_on="Date Range",
+		period_start_date=period_start_date,
+		period_end_date=get_last_day(add_months(period_start_date, months - 1)),
+		periodicity=periodicity,
+		presentation_currency=presentation_currency,
+	)
+
+	forecast = CashFlowForecast(frappe._dict(filters))
+	forecast.debug = True
+	with forecast.measure("total"):
+		forecast.get_result()
+
+	total = forecast.stages.pop("total")
+	total["peak_memory"] = get_peak_memory(filters)
+
+	results = {
+		"timestamp": now(),
+		"filters": {key: str(value) if value else value for key, value in filters.items()},
+		"sizes": get_sizes(),
+		"total": total,
+		"stages": forecast.stages,
+	}
+
+	if output:
+		with open(output, "w") as f:
+			json.dump(results, f, indent=2)
+
+	return results
+
+
+def get_peak_memory(filters):
+	"""Return the peak memory of a separate run, as tracing slows down the timed one."""
+	forecast = CashFlowForecast(frappe._dict(filters))
+	forecast.debug = True
+
+	tracemalloc.start()
+	try:
+		forecast.get_result()
+		return tracemalloc.get_traced_memory()[1]
+	finally:
+		tracemalloc.stop()
+
+
+def compare(results, baseline):
+	"""Return the relative change of the time and query count of each stage against `baseline`."""
+	changes = {}
+	for name, current in [("total", results["total"]), *results["stages"].items()]:
+		previous = baseline["total"] if name == "total" else baseline["stages"].get(name)
+		if not previous:
+			continue
+
+		changes[name] = {
+			key: (current[key] - previous[key]) / previous[key] if previous[key] else None
+			for key in ("time", "queries")
+		}
+
+	return changes
+
+
+def get_sizes():
+	"""Return the number of synthetic documents per doctype."""
+	return {
+		doctype: frappe.db.count(doctype, {"owner": OWNER}) for doctype in DOCTYPES
+	}
+
+
+def format_results(results, changes=None):
+	"""Return a plain text table of `results`."""
+	lines = [f"{'Stage':<45}{'Time (s)':>12}{'Queries':>10}{'Change':>10}"]
+	for name, stage in [*results["stages"].items(), ("total", results["total"])]:
+		change = (changes or {}).get(name, {}).get("time")
+		lines.append(
+			f"{name:<45}{stage['time']:>12.3f}{stage['queries']:>10}"
+			+ (f"{flt(change) * 100:>+9.1f}%" if change is not None else f"{'':>10}")
+		)
+
+	lines.append(f"Peak memory: {results['total']['peak_memory'] / 1024 / 1024:.1f} MiB")
+	return "\n".join(lines)
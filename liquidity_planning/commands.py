@@ -0,0 +1,116 @@
+import click
+from frappe.commands import get_site, pass_context
+
+
+@click.command("rebuild-cash-flow-buckets")
+@click.option("--company", help="Only rebuild the buckets of this company")
+@pass_context
+def rebuild_cash_flow_buckets(context, company=None):
+	"""Recompute the Cash Flow Buckets from the source documents."""
+	import frappe
+
+	from liquidity_planning.liquidity_planning.doctype.cash_flow_bucket.cash_flow_bucket import (
+		rebuild_buckets,
+	)
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		rebuild_buckets(company)
+		frappe.db.commit()
+	finally:
+		frappe.destroy()
+
+
+@click.command("benchmark-cash-flow-forecast")
+@click.option("--generate", is_flag=True, help="Replace the synthetic dataset before running")
+@click.option("--cleanup", is_flag=True, help="Delete the synthetic dataset after running")
+@click.option("--seed", type=int, default=0, help="Seed for the synthetic dataset")
+@click.option("--companies", type=int)
+@click.option("--currencies", type=int)
+@click.option("--orders", type=int)
+@click.option("--invoices", type=int)
+@click.option("--auto-repeats", type=int)
+@click.option("--employees", type=int)
+@click.option("--expense-claims", type=int)
+@click.option("--months", type=int, default=12, help="Forecast horizon in months")
+@click.option("--periodicity", default="Monthly")
+@click.option("--output", help="Write the measurements to this JSON file")
+@click.option("--baseline", help="Compare the measurements to this JSON file")
+@pass_context
+def benchmark_cash_flow_forecast(
+	context,
+	generate=False,
+	cleanup=False,
+	seed=0,
+	months=12,
+	periodicity="Monthly",
+	output=None,
+	baseline=None,
+	**sizes,
+):
+	"""Measure the Cash Flow Forecast on a synthetic dataset. Only use on a throwaway site!"""
+	import json
+
+	import frappe
+
+	from liquidity_planning.benchmark import (
+		compare,
+		delete_data,
+		format_results,
+		generate_data,
+		run_benchmark,
+	)
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		if generate:
+			generate_data(seed=seed, months=months, **sizes)
+
+		results = run_benchmark(output=output, months=months, periodicity=periodicity)
+
+		changes = None
+		if baseline:
+			with open(baseline) as f:
+				changes = compare(results, json.load(f))
+
+		click.echo(format_results(results, changes))
+
+		if cleanup:
+			delete_data()
+	finally:
+		frappe.destroy()
+
+
+@click.command("check-cash-flow-forecast-indexes")
+@pass_context
+def check_cash_flow_forecast_indexes(context):
+	"""Report the indexes used by the Cash Flow Forecast that are missing."""
+	import frappe
+
+	from liquidity_planning.indexes import get_missing_indexes
+
+	frappe.init(site=get_site(context))
+	frappe.connect()
+	try:
+		missing_indexes = get_missing_indexes()
+	finally:
+		frappe.destroy()
+
+	if not missing_indexes:
+		click.secho("All indexes exist.", fg="green")
+		return
+
+	for doctype, fields in missing_indexes:
+		click.secho(f"Missing index on {doctype} ({', '.join(fields)})", fg="yellow")
+
+	click.echo("Run `bench migrate` to create them.")
+	raise SystemExit(1)
+
+
+commands = [
+	rebuild_cash_flow_buckets,
+	benchmark_cash_flow_forecast,
+	check_cash_flow_forecast_indexes,
+]
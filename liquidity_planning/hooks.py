@@ -62,7 +62,11 @@ app_license = "gpl-3.0"
 # ------------
 
 # before_install = "liquidity_planning.install.before_install"
-# after_install = "liquidity_planning.install.after_install"
+after_install = "liquidity_planning.install.after_install"
+after_migrate = [
+	"liquidity_planning.indexes.add_indexes",
+	"liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast.clear_cache",
+]
 
 # Uninstallation
 # ------------
@@ -124,26 +128,77 @@ app_license = "gpl-3.0"
 # 	}
 # }
 
+_clear_cache = (
+	"liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast.clear_cache"
+)
+_update_buckets = (
+	"liquidity_planning.liquidity_planning.doctype.cash_flow_bucket.cash_flow_bucket.update_buckets"
+)
+
+_update_invoice_buckets = (
+	"liquidity_planning.liquidity_planning.doctype.cash_flow_bucket.cash_flow_bucket"
+	".update_invoice_buckets"
+)
+
+_cache_events = {
+	"on_update": _clear_cache,
+	"on_submit": _clear_cache,
+	"on_cancel": _clear_cache,
+	"on_update_after_submit": _clear_cache,
+	"on_trash": _clear_cache,
+}
+
+_bucket_events = {
+	**_cache_events,
+	"on_submit": [_clear_cache, _update_buckets],
+	"on_cancel": [_clear_cache, _update_buckets],
+	"on_update_after_submit": [_clear_cache, _update_buckets],
+}
+
+_payment_events = {
+	**_cache_events,
+	"on_submit": [_clear_cache, _update_invoice_buckets],
+	"on_cancel": [_clear_cache, _update_invoice_buckets],
+}
+
+# Closing and reopening an order only runs `on_change`
+# `on_change` runs after every save, submit and cancel
+_order_events = {
+	**_cache_events,
+	"on_change": [_clear_cache, _update_buckets],
+}
+
+doc_events = {
+	"Sales Order": _order_events,
+	"Purchase Order": _order_events,
+	"Sales Invoice": _bucket_events,
+	"Purchase Invoice": _bucket_events,
+	# Draft expense claims are part of the forecast as well
+	"Expense Claim": {
+		**_bucket_events,
+		"on_update": [_clear_cache, _update_buckets],
+		"after_delete": _update_buckets,
+	},
+	"Employee": _cache_events,
+	"Auto Repeat": _cache_events,
+	"Currency Exchange": _cache_events,
+	# Change the balance of bank and cash accounts and the outstanding amount of invoices
+	"Payment Entry": _payment_events,
+	"Journal Entry": _payment_events,
+}
+
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"liquidity_planning.tasks.all"
-# 	],
-# 	"daily": [
-# 		"liquidity_planning.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"liquidity_planning.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"liquidity_planning.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"liquidity_planning.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+	"daily": [
+		"liquidity_planning.liquidity_planning.doctype.payment_delay.payment_delay.update_payment_delays"
+	],
+	"daily_long": [
+		"liquidity_planning.liquidity_planning.doctype.cash_flow_forecast_snapshot"
+		".cash_flow_forecast_snapshot.create_snapshots"
+	],
+}
 
 # Testing
 # -------
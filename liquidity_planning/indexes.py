@@ -0,0 +1,35 @@
+import frappe
+
+# Composite indexes matching the access paths of the Cash Flow Forecast. Orders
+# and invoices are found by company and docstatus, then by what is still open
+# (per_billed below 100, outstanding_amount other than 0), which stays small
+# no matter how much history exists. Expense claims are found by company, then
+# by a range of posting dates, with the status checked from the index.
+# All of them start with the company, so they are only used when the report
+# is filtered by company, not in consolidated mode.
+INDEXES = {
+	"Sales Order": ["company", "docstatus", "per_billed"],
+	"Purchase Order": ["company", "docstatus", "per_billed"],
+	"Sales Invoice": ["company", "docstatus", "outstanding_amount"],
+	"Purchase Invoice": ["company", "docstatus", "outstanding_amount"],
+	"Expense Claim": ["company", "posting_date", "status"],
+}
+
+
+def get_index_name(fields):
+	return "liquidity_planning_" + "_".join(fields)
+
+
+def add_indexes():
+	"""Create the indexes used by the Cash Flow Forecast, if they don't exist yet."""
+	for doctype, fields in INDEXES.items():
+		frappe.db.add_index(doctype, fields, index_name=get_index_name(fields))
+
+
+def get_missing_indexes():
+	"""Return the (doctype, fields) of all indexes that don't exist."""
+	return [
+		(doctype, fields)
+		for doctype, fields in INDEXES.items()
+		if not frappe.db.has_index(f"tab{doctype}", get_index_name(fields))
+	]
@@ -0,0 +1,15 @@
+from liquidity_planning.indexes import add_indexes
+from liquidity_planning.liquidity_planning.doctype.cash_flow_bucket.cash_flow_bucket import (
+	buckets_enabled,
+	rebuild_buckets,
+)
+from liquidity_planning.liquidity_planning.doctype.payment_delay.payment_delay import (
+	update_payment_delays,
+)
+
+
+def after_install():
+	add_indexes()
+	if buckets_enabled():
+		rebuild_buckets()
+	update_payment_delays()
@@ -0,0 +1,218 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+from collections import defaultdict
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder.functions import Sum
+from frappe.utils import getdate, now
+
+from liquidity_planning.queries import (
+	DATE_FIELDS,
+	get_expense_claims,
+	get_open_orders,
+	get_outstanding_invoices,
+)
+
+# Invoices update the `per_billed` of the orders linked in these item fields
+ORDER_FIELDS = {
+	"Sales Invoice": ("Sales Order", "sales_order"),
+	"Purchase Invoice": ("Purchase Order", "purchase_order"),
+}
+
+INVOICE_DOCTYPES = ("Sales Invoice", "Purchase Invoice")
+
+
+class CashFlowBucket(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Cash Flow Bucket", ["company", "posting_date", "source"])
+
+
+def buckets_enabled():
+	return bool(frappe.conf.get("cash_flow_forecast_use_buckets"))
+
+
+def update_buckets(doc, method=None):
+	"""Refresh the buckets affected by `doc`. Called from `doc_events`."""
+	if not buckets_enabled():
+		return
+
+	dates = get_dates(doc)
+
+	doc_before_save = doc.get_doc_before_save()
+	if doc_before_save:
+		dates |= get_dates(doc_before_save)
+
+	refresh_buckets(doc.doctype, doc.company, dates)
+
+	# Returns reduce the outstanding amount of the original invoice
+	if doc.doctype in INVOICE_DOCTYPES and doc.get("return_against"):
+		refresh_invoice_buckets(doc.doctype, [doc.return_against])
+
+	if doc.doctype in ORDER_FIELDS:
+		order_doctype, fieldname = ORDER_FIELDS[doc.doctype]
+		order_names = {item.get(fieldname) for item in doc.get("items") if item.get(fieldname)}
+		if not order_names:
+			return
+
+		date_field = DATE_FIELDS[order_doctype]
+		orders = frappe.get_all(
+			order_doctype,
+			filters={"name": ["in", order_names]},
+			fields=["company", date_field],
+			distinct=True,
+		)
+		for order in orders:
+			refresh_buckets(order_doctype, order.company, {order.get(date_field)})
+
+
+def update_invoice_buckets(doc, method=None):
+	"""Refresh the buckets of the invoices paid by `doc`, a Payment Entry or Journal Entry.
+
+	Called from `doc_events`.
+	"""
+	if not buckets_enabled():
+		return
+
+	if doc.doctype == "Payment Entry":
+		references = [(row.reference_doctype, row.reference_name) for row in doc.references]
+	else:
+		references = [(row.reference_type, row.reference_name) for row in doc.accounts]
+
+	for doctype in INVOICE_DOCTYPES:
+		names = {name for reference_doctype, name in references if reference_doctype == doctype}
+		if names:
+			refresh_invoice_buckets(doctype, names)
+
+
+def refresh_invoice_buckets(doctype, names):
+	"""Recompute the buckets of all due dates of the invoices `names`."""
+	invoice = frappe.qb.DocType(doctype)
+	payment_schedule = frappe.qb.DocType("Payment Schedule")
+
+	rows = (
+		frappe.qb.from_(invoice)
+		.left_join(payment_schedule)
+		.on((payment_schedule.parent == invoice.name) & (payment_schedule.parenttype == doctype))
+		.select(invoice.company, invoice.due_date, payment_schedule.due_date.as_("term_due_date"))
+		.where(invoice.name.isin(list(names)))
+	).run(as_dict=True)
+
+	dates = defaultdict(set)
+	for row in rows:
+		dates[row.company] |= {row.due_date, row.term_due_date}
+
+	for company, company_dates in dates.items():
+		refresh_buckets(doctype, company, company_dates)
+
+
+def get_dates(doc):
+	"""Return the dates of the buckets that `doc` contributes to."""
+	dates = {doc.get(DATE_FIELDS[doc.doctype])}
+	if doc.doctype in INVOICE_DOCTYPES:
+		dates |= {row.due_date for row in doc.get("payment_schedule")}
+
+	return dates
+
+
+def refresh_buckets(doctype, company, dates):
+	"""Recompute the buckets of `doctype` for `company` on `dates` from the source documents."""
+	dates = list({getdate(date) for date in dates if date})
+	if not dates:
+		return
+
+	bucket = frappe.qb.DocType("Cash Flow Bucket")
+	(
+		frappe.qb.from_(bucket)
+		.delete()
+		.where(bucket.company == company)
+		.where(bucket.source == doctype)
+		.where(bucket.posting_date.isin(dates))
+	).run()
+
+	insert_buckets(get_daily_amounts(doctype, company, dates))
+
+
+def rebuild_buckets(company=None):
+	"""Recompute all buckets, or only those of `company`, from the source documents."""
+	bucket = frappe.qb.DocType("Cash Flow Bucket")
+	query = frappe.qb.from_(bucket).delete()
+	if company:
+		query = query.where(bucket.company == company)
+	query.run()
+
+	for doctype in DATE_FIELDS:
+		insert_buckets(get_daily_amounts(doctype, company))
+
+
+def get_daily_amounts(doctype, company=None, dates=None):
+	"""Return the amounts of `doctype` per company, source, day and currency."""
+	if doctype in INVOICE_DOCTYPES:
+		documents = get_outstanding_invoices(doctype, company)
+	elif doctype == "Expense Claim":
+		documents = get_expense_claims(company)
+	else:
+		documents = get_open_orders(doctype, company)
+
+	query = (
+		frappe.qb.from_(documents)
+		.select(
+			documents.company,
+			documents.posting_date,
+			documents.currency,
+			Sum(documents.amount).as_("amount"),
+		)
+		.groupby(documents.company, documents.posting_date, documents.currency)
+	)
+
+	if dates:
+		query = query.where(documents.posting_date.isin(dates))
+
+	return [
+		frappe._dict(
+			company=row.company,
+			source=doctype,
+			posting_date=row.posting_date,
+			currency=row.currency,
+			amount=row.amount,
+		)
+		for row in query.run(as_dict=True)
+	]
+
+
+def insert_buckets(buckets):
+	timestamp = now()
+	frappe.db.bulk_insert(
+		"Cash Flow Bucket",
+		fields=[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"company",
+			"source",
+			"posting_date",
+			"currency",
+			"amount",
+		],
+		values=[
+			(
+				frappe.generate_hash(length=10),
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				frappe.session.user,
+				bucket.company,
+				bucket.source,
+				bucket.posting_date,
+				bucket.currency,
+				bucket.amount,
+			)
+			for bucket in buckets
+		],
+	)
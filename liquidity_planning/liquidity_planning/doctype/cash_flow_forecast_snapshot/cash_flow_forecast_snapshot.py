@@ -0,0 +1,159 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_months, cint, flt, get_first_day, get_last_day, getdate
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	CashFlowForecast,
+)
+
+# Number of versions kept per filter combination, unless set in the preset
+KEEP_VERSIONS = 90
+
+
+class CashFlowForecastSnapshot(Document):
+	pass
+
+
+def create_snapshots():
+	"""Compute and store the forecast of every preset in the site config. Runs daily.
+
+	Presets are configured as a list of filters, e.g.
+	`bench --site $MY_SITE set-config -p cash_flow_forecast_snapshot_presets
+	'[{"company": "ALYF GmbH", "months": 12}]'`
+
+	As the results contain translated labels, a snapshot is taken in each of
+	the `languages` of the preset, by default those of all users. Only the
+	latest `versions` snapshots of each preset and language are kept.
+	"""
+	lang = frappe.local.lang
+	try:
+		for preset in frappe.conf.get("cash_flow_forecast_snapshot_presets") or []:
+			for preset_lang in preset.get("languages") or get_languages():
+				frappe.local.lang = preset_lang
+				create_snapshot(
+					get_preset_filters(preset), cint(preset.get("versions")) or KEEP_VERSIONS
+				)
+				frappe.db.commit()
+	finally:
+		frappe.local.lang = lang
+
+
+def get_languages():
+	"""Return the system language and the languages of all enabled system users."""
+	system_language = frappe.db.get_single_value("System Settings", "language") or "en"
+	user_languages = frappe.get_all(
+		"User",
+		filters={"enabled": 1, "user_type": "System User", "language": ["is", "set"]},
+		pluck="language",
+		distinct=True,
+	)
+
+	return sorted({system_language, *user_languages})
+
+
+def get_preset_filters(preset):
+	"""Return the report filters of `preset`, covering `months` months from the current one."""
+	period_start_date = get_first_day(getdate())
+	months = cint(preset.get("months")) or 12
+
+	return frappe._dict(
+		company=preset.get("company"),
+		filter_based_on="Date Range",
+		period_start_date=period_start_date,
+		period_end_date=get_last_day(add_months(period_start_date, months - 1)),
+		periodicity=preset.get("periodicity") or "Monthly",
+		presentation_currency=preset.get("presentation_currency") or "EUR",
+		apply_payment_delays=cint(preset.get("apply_payment_delays", 1)),
+	)
+
+
+def create_snapshot(filters, keep_versions=KEEP_VERSIONS):
+	forecast = CashFlowForecast(filters)
+	filters_hash = forecast.get_filters_hash()
+	version = cint(
+		frappe.db.get_value(
+			"Cash Flow Forecast Snapshot",
+			{"filters_hash": filters_hash},
+			"version",
+			order_by="version desc",
+		)
+	)
+
+	snapshot = frappe.get_doc(
+		{
+			"doctype": "Cash Flow Forecast Snapshot",
+			"company": filters.company,
+			"periodicity": filters.periodicity,
+			"presentation_currency": filters.presentation_currency,
+			"from_date": forecast.time_periods[0]["from_date"],
+			"to_date": forecast.time_periods[-1]["to_date"],
+			"version": version + 1,
+			"filters_hash": filters_hash,
+			"filters": forecast.get_cache_key(),
+			"result": frappe.as_json(forecast.get_result()),
+		}
+	).insert(ignore_permissions=True)
+
+	delete_old_snapshots(filters_hash, snapshot.version - keep_versions)
+	return snapshot
+
+
+def delete_old_snapshots(filters_hash, last_version):
+	"""Delete the snapshots of `filters_hash` up to and including `last_version`."""
+	snapshot = frappe.qb.DocType("Cash Flow Forecast Snapshot")
+	(
+		frappe.qb.from_(snapshot)
+		.delete()
+		.where(snapshot.filters_hash == filters_hash)
+		.where(snapshot.version <= last_version)
+	).run()
+
+
+@frappe.whitelist()
+def diff_snapshots(old_snapshot, new_snapshot):
+	"""Return the rows of `new_snapshot` with the change of every amount since `old_snapshot`.
+
+	Rows are matched by the titles of the row and its parents, periods by key.
+	"""
+	old_columns, old_data = get_snapshot_result(old_snapshot)[:2]
+	columns, data = get_snapshot_result(new_snapshot)[:2]
+
+	fieldnames = [column["fieldname"] for column in columns if column["fieldname"] != "account"]
+	old_rows = dict(get_rows_by_path(old_data))
+
+	diff = []
+	for path, row in get_rows_by_path(data):
+		old_row = old_rows.get(path, {})
+		diff.append(
+			{
+				**row,
+				**{
+					fieldname: flt(row.get(fieldname)) - flt(old_row.get(fieldname))
+					for fieldname in fieldnames
+				},
+			}
+		)
+
+	return columns, diff
+
+
+def get_snapshot_result(name):
+	snapshot = frappe.get_doc("Cash Flow Forecast Snapshot", name)
+	snapshot.check_permission("read")
+	return json.loads(snapshot.result)
+
+
+def get_rows_by_path(data):
+	"""Yield every titled row with the titles of its parents and itself."""
+	path = []
+	for row in data:
+		if not row.get("account"):
+			continue
+
+		path = path[: cint(row.get("indent"))] + [row["account"]]
+		yield tuple(path), row
@@ -0,0 +1,107 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+
+from liquidity_planning.liquidity_planning.doctype.cash_flow_forecast_snapshot.cash_flow_forecast_snapshot import (
+	delete_old_snapshots,
+	diff_snapshots,
+	get_rows_by_path,
+)
+
+COLUMNS = [
+	{"fieldname": "account", "label": "Account"},
+	{"fieldname": "jan_2026", "label": "Jan 2026"},
+	{"fieldname": "total", "label": "Total"},
+]
+
+
+def make_row(account, indent, jan_2026):
+	return {"account": account, "indent": indent, "jan_2026": jan_2026, "total": jan_2026}
+
+
+def make_snapshot(version, data, filters_hash="_test_filters_hash"):
+	return frappe.get_doc(
+		{
+			"doctype": "Cash Flow Forecast Snapshot",
+			"periodicity": "Monthly",
+			"presentation_currency": "EUR",
+			"from_date": "2026-01-01",
+			"to_date": "2026-01-31",
+			"version": version,
+			"filters_hash": filters_hash,
+			"filters": "{}",
+			"result": frappe.as_json([COLUMNS, data]),
+		}
+	).insert(ignore_permissions=True)
+
+
+class TestCashFlowForecastSnapshot(FrappeTestCase):
+	def test_rows_by_path(self):
+		data = [
+			make_row("Income", 0, 100),
+			make_row("Sales Orders", 1, 60),
+			make_row("Company A", 2, 60),
+			make_row("Sales Invoices", 1, 40),
+			make_row("Company A", 2, 40),
+			{},
+			make_row("Expenses", 0, 0),
+		]
+
+		paths = [path for path, row in get_rows_by_path(data)]
+
+		self.assertEqual(
+			paths,
+			[
+				("Income",),
+				("Income", "Sales Orders"),
+				("Income", "Sales Orders", "Company A"),
+				("Income", "Sales Invoices"),
+				("Income", "Sales Invoices", "Company A"),
+				("Expenses",),
+			],
+		)
+
+	def test_diff_snapshots(self):
+		old_snapshot = make_snapshot(
+			1, [make_row("Income", 0, 100), make_row("Sales Orders", 1, 100)]
+		)
+		new_snapshot = make_snapshot(
+			2,
+			[
+				make_row("Income", 0, 150),
+				make_row("Sales Orders", 1, 120),
+				make_row("Sales Invoices", 1, 30),
+			],
+		)
+
+		columns, diff = diff_snapshots(old_snapshot.name, new_snapshot.name)
+
+		self.assertEqual(columns, COLUMNS)
+		self.assertEqual(
+			[(row["account"], row["jan_2026"], row["total"]) for row in diff],
+			[("Income", 50, 50), ("Sales Orders", 20, 20), ("Sales Invoices", 30, 30)],
+		)
+
+	def test_delete_old_snapshots(self):
+		for version in range(1, 5):
+			make_snapshot(version, [])
+		make_snapshot(1, [], filters_hash="_test_other_filters_hash")
+
+		delete_old_snapshots("_test_filters_hash", 2)
+
+		self.assertEqual(
+			frappe.get_all(
+				"Cash Flow Forecast Snapshot",
+				filters={"filters_hash": "_test_filters_hash"},
+				pluck="version",
+				order_by="version",
+			),
+			[3, 4],
+		)
+		self.assertTrue(
+			frappe.db.exists(
+				"Cash Flow Forecast Snapshot", {"filters_hash": "_test_other_filters_hash"}
+			)
+		)
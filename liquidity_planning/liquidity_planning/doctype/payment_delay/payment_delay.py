@@ -0,0 +1,120 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.query_builder import CustomFunction
+from frappe.query_builder.functions import Abs, Count, Sum
+from frappe.utils import add_days, cint, now, today
+
+# Party type and field of the invoices whose payments are analyzed
+PARTY_FIELDS = {
+	"Sales Invoice": ("Customer", "customer"),
+	"Purchase Invoice": ("Supplier", "supplier"),
+}
+
+# Only payments of this many past days are taken into account
+LOOKBACK_DAYS = 365
+
+# Delays are limited to this many days, early or late
+MAX_DELAY = 180
+
+DateDiff = CustomFunction("DATEDIFF", ["end_date", "start_date"])
+
+
+class PaymentDelay(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index("Payment Delay", ["party_type", "party"])
+
+
+def update_payment_delays():
+	"""Recompute the payment delay of every party from the Payment Ledger. Runs daily."""
+	# The report imports this module
+	from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+		clear_cache,
+	)
+
+	delays = []
+	for doctype in PARTY_FIELDS:
+		delays.extend(get_payment_delays(doctype))
+
+	frappe.db.delete("Payment Delay")
+	insert_payment_delays(delays)
+	clear_cache()
+
+
+def get_payment_delays(doctype):
+	"""Return the average delay of the payments of invoices of `doctype`, per party.
+
+	The delay of every payment is the number of days between the due date of
+	the invoice and the payment, weighted by the paid amount. Invoices with
+	several payment terms are left out, as the due date of the invoice is the
+	one of its last term, and payments don't tell which term they settle.
+	"""
+	payment_ledger_entry = frappe.qb.DocType("Payment Ledger Entry")
+	invoice = frappe.qb.DocType(doctype)
+	payment_schedule = frappe.qb.DocType("Payment Schedule")
+	delay = DateDiff(payment_ledger_entry.posting_date, invoice.due_date)
+	amount = Abs(payment_ledger_entry.amount)
+	invoices_with_several_terms = (
+		frappe.qb.from_(payment_schedule)
+		.select(payment_schedule.parent)
+		.where(payment_schedule.parenttype == doctype)
+		.groupby(payment_schedule.parent)
+		.having(Count(payment_schedule.name) > 1)
+	)
+
+	return (
+		frappe.qb.from_(payment_ledger_entry)
+		.join(invoice)
+		.on(invoice.name == payment_ledger_entry.against_voucher_no)
+		.select(
+			payment_ledger_entry.party_type,
+			payment_ledger_entry.party,
+			(Sum(delay * amount) / Sum(amount)).as_("delay"),
+			Count(payment_ledger_entry.name).as_("payments"),
+		)
+		.where(payment_ledger_entry.against_voucher_type == doctype)
+		.where(payment_ledger_entry.voucher_type.isin(["Payment Entry", "Journal Entry"]))
+		.where(payment_ledger_entry.party_type == PARTY_FIELDS[doctype][0])
+		.where(payment_ledger_entry.delinked == 0)
+		.where(payment_ledger_entry.posting_date >= add_days(today(), -LOOKBACK_DAYS))
+		.where(payment_ledger_entry.amount != 0)
+		.where(invoice.name.notin(invoices_with_several_terms))
+		.groupby(payment_ledger_entry.party_type, payment_ledger_entry.party)
+	).run(as_dict=True)
+
+
+def insert_payment_delays(delays):
+	timestamp = now()
+	frappe.db.bulk_insert(
+		"Payment Delay",
+		fields=[
+			"name",
+			"creation",
+			"modified",
+			"owner",
+			"modified_by",
+			"party_type",
+			"party",
+			"delay",
+			"payments",
+		],
+		values=[
+			(
+				frappe.generate_hash(length=10),
+				timestamp,
+				timestamp,
+				frappe.session.user,
+				frappe.session.user,
+				row.party_type,
+				row.party,
+				max(-MAX_DELAY, min(MAX_DELAY, round(float(row.delay or 0)))),
+				cint(row.payments),
+			)
+			for row in delays
+		],
+	)
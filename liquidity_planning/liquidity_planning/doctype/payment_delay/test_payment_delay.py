@@ -0,0 +1,87 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, today
+
+from liquidity_planning.liquidity_planning.doctype.payment_delay.payment_delay import (
+	MAX_DELAY,
+	get_payment_delays,
+	update_payment_delays,
+)
+
+
+def make_invoice(name, customer, due_date, terms=()):
+	frappe.get_doc(
+		doctype="Sales Invoice",
+		name=name,
+		customer=customer,
+		due_date=due_date,
+		docstatus=1,
+	).db_insert()
+
+	for idx, term_due_date in enumerate(terms, 1):
+		frappe.get_doc(
+			doctype="Payment Schedule",
+			name=f"{name}-{idx}",
+			parent=name,
+			parenttype="Sales Invoice",
+			parentfield="payment_schedule",
+			idx=idx,
+			due_date=term_due_date,
+			invoice_portion=100 / len(terms),
+		).db_insert()
+
+
+def make_payment(name, invoice, customer, posting_date, amount):
+	frappe.get_doc(
+		doctype="Payment Ledger Entry",
+		name=name,
+		posting_date=posting_date,
+		party_type="Customer",
+		party=customer,
+		voucher_type="Payment Entry",
+		voucher_no=name,
+		against_voucher_type="Sales Invoice",
+		against_voucher_no=invoice,
+		amount=-amount,
+		delinked=0,
+	).db_insert()
+
+
+class TestPaymentDelay(FrappeTestCase):
+	def test_delay_weighted_by_amount(self):
+		make_invoice("_T-PD-SINV-1", "_T-PD-CUST-1", add_days(today(), -30))
+		make_payment("_T-PD-PAY-1", "_T-PD-SINV-1", "_T-PD-CUST-1", add_days(today(), -20), 100)
+		make_payment("_T-PD-PAY-2", "_T-PD-SINV-1", "_T-PD-CUST-1", add_days(today(), -10), 300)
+
+		delays = {row.party: row for row in get_payment_delays("Sales Invoice")}
+
+		self.assertAlmostEqual(float(delays["_T-PD-CUST-1"].delay), 17.5)
+		self.assertEqual(delays["_T-PD-CUST-1"].payments, 2)
+
+	def test_invoices_with_several_terms_are_left_out(self):
+		make_invoice(
+			"_T-PD-SINV-2",
+			"_T-PD-CUST-2",
+			add_days(today(), -10),
+			terms=(add_days(today(), -40), add_days(today(), -10)),
+		)
+		make_payment("_T-PD-PAY-3", "_T-PD-SINV-2", "_T-PD-CUST-2", add_days(today(), -40), 50)
+
+		delays = {row.party for row in get_payment_delays("Sales Invoice")}
+
+		self.assertNotIn("_T-PD-CUST-2", delays)
+
+	def test_delay_is_clamped(self):
+		make_invoice("_T-PD-SINV-3", "_T-PD-CUST-3", add_days(today(), -300))
+		make_payment("_T-PD-PAY-4", "_T-PD-SINV-3", "_T-PD-CUST-3", today(), 100)
+		make_invoice("_T-PD-SINV-4", "_T-PD-CUST-4", add_days(today(), 250))
+		make_payment("_T-PD-PAY-5", "_T-PD-SINV-4", "_T-PD-CUST-4", today(), 100)
+
+		update_payment_delays()
+
+		delays = dict(frappe.get_all("Payment Delay", fields=["party", "delay"], as_list=True))
+		self.assertEqual(delays["_T-PD-CUST-3"], MAX_DELAY)
+		self.assertEqual(delays["_T-PD-CUST-4"], -MAX_DELAY)
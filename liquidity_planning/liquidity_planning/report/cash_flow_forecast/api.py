@@ -0,0 +1,96 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+"""Headless API for the Cash Flow Forecast.
+
+Returns the forecast as columnar JSON for BI and treasury systems: the time
+periods once, then one array of amounts per series, aligned to the periods.
+
+Every response has an ETag derived from the filters, the current date and
+the version of the source data, which changes whenever `clear_cache` runs.
+Clients that send it back in `If-None-Match` get an empty 304 response until
+the forecast would change.
+"""
+
+import hashlib
+
+import frappe
+from werkzeug.http import parse_etags, quote_etag
+from werkzeug.wrappers import Response
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	CACHE_KEY,
+	CashFlowForecast,
+	check_permission,
+	get_data_version,
+)
+
+# Rows of `CashFlowForecast`, in the order of the report
+SERIES = (
+	"income",
+	"sales_orders",
+	"sales_orders_open",
+	"sales_orders_scheduled",
+	"sales_invoices",
+	"expenses",
+	"purchase_orders",
+	"purchase_orders_open",
+	"purchase_orders_scheduled",
+	"purchase_invoices",
+	"salaries",
+	"expense_claims",
+	"total_income",
+	"total_expenses",
+	"net_cash_flow",
+	"opening_balance",
+	"closing_balance",
+)
+
+
+@frappe.whitelist(methods=["GET"])
+def get_forecast(filters):
+	"""Return the Cash Flow Forecast for `filters` as columnar JSON, or 304 if unchanged."""
+	check_permission()
+
+	forecast = CashFlowForecast(frappe._dict(frappe.parse_json(filters)))
+	cache_key = forecast.get_cache_key()
+	etag = hashlib.sha1(f"{cache_key}:{get_data_version()}".encode()).hexdigest()
+	headers = {"ETag": quote_etag(etag), "Cache-Control": "private, no-cache"}
+
+	if parse_etags(frappe.get_request_header("If-None-Match")).contains_weak(etag):
+		return Response(status=304, headers=headers)
+
+	# Stored next to the report results, so that `clear_cache` drops it as well
+	payload = frappe.cache().hget(CACHE_KEY, f"columnar:{cache_key}")
+	if payload is None:
+		payload = get_columnar_result(forecast)
+		frappe.cache().hset(CACHE_KEY, f"columnar:{cache_key}", payload)
+
+	return Response(
+		frappe.as_json({"message": payload}, indent=None, separators=(",", ":")),
+		mimetype="application/json",
+		headers=headers,
+	)
+
+
+def get_columnar_result(forecast):
+	"""Return the periods and the amounts of every series of `forecast` as parallel arrays."""
+	forecast.load_data()
+	forecast.calculate_rows()
+
+	time_periods = forecast.time_periods
+	rows = {series: getattr(forecast, series) for series in SERIES}
+
+	return {
+		"company": forecast.filters.company,
+		"currency": forecast.filters.presentation_currency,
+		"periodicity": forecast.filters.periodicity,
+		"periods": {
+			"key": [period["key"] for period in time_periods],
+			"label": [period["label"] for period in time_periods],
+			"from_date": [str(period["from_date"]) for period in time_periods],
+			"to_date": [str(period["to_date"]) for period in time_periods],
+		},
+		"series": {series: row["values"].tolist() for series, row in rows.items()},
+		"totals": {series: row["total"] for series, row in rows.items()},
+	}
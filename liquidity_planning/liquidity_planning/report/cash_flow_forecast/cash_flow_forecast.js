@@ -2,7 +2,149 @@
 // For license information, please see license.txt
 /* eslint-disable */
 
+frappe.provide("liquidity_planning");
+
+// Shows the parties behind a figure of the report, and the documents of each
+// party, loading them page by page when they are expanded.
+liquidity_planning.CashFlowDrillDown = class CashFlowDrillDown {
+	constructor(report, { section, period, company, party, title }) {
+		this.filters = report.get_filter_values();
+		if (company) {
+			this.filters.company = company;
+		}
+
+		this.section = section;
+		this.period = period;
+		this.party = party;
+		this.title = title;
+	}
+
+	show() {
+		this.dialog = new frappe.ui.Dialog({
+			title: this.title,
+			size: "large",
+			fields: [{ fieldtype: "HTML", fieldname: "tree" }],
+		});
+		this.$tree = $('<ul class="list-unstyled"></ul>').appendTo(
+			this.dialog.fields_dict.tree.$wrapper
+		);
+		this.dialog.show();
+		this.load_children(this.$tree, this.party);
+	}
+
+	load_children($list, party, start = 0) {
+		return frappe
+			.call({
+				method: "liquidity_planning.liquidity_planning.report.cash_flow_forecast.drill_down.get_children",
+				args: {
+					filters: this.filters,
+					section: this.section,
+					period: this.period,
+					party: party,
+					start: start,
+				},
+			})
+			.then(({ message }) => {
+				$list.children(".drill-down-more").remove();
+				for (const child of message.children) {
+					$list.append(this.make_node(child, message.currency));
+				}
+
+				if (message.has_more) {
+					$(`<li class="drill-down-more">
+						<button class="btn btn-xs btn-default">${__("Load More")}</button>
+					</li>`)
+						.appendTo($list)
+						.find("button")
+						.on("click", () =>
+							this.load_children($list, party, start + message.children.length)
+						);
+				}
+			});
+	}
+
+	make_node(child, currency) {
+		const amount = format_currency(child.amount, currency);
+
+		if (child.doctype) {
+			const route = `/app/${frappe.router.slug(child.doctype)}/${encodeURIComponent(
+				child.name
+			)}`;
+			return $(`<li class="ml-4">
+				<a href="${route}" target="_blank">${frappe.utils.escape_html(child.name)}</a>
+				<span class="pull-right">${amount}</span>
+			</li>`);
+		}
+
+		const $node = $(`<li>
+			<a href="#" class="drill-down-toggle">${frappe.utils.escape_html(child.party)}</a>
+			<span class="text-muted">(${child.documents})</span>
+			<span class="pull-right">${amount}</span>
+			<ul class="list-unstyled hidden"></ul>
+		</li>`);
+		const $children = $node.children("ul");
+
+		$node.children(".drill-down-toggle").on("click", (e) => {
+			e.preventDefault();
+			if (!$children.data("loaded")) {
+				$children.data("loaded", true);
+				this.load_children($children, child.party);
+			}
+			$children.toggleClass("hidden");
+		});
+
+		return $node;
+	}
+};
+
 frappe.query_reports["Cash Flow Forecast"] = {
+	onload: function (report) {
+		report.$report.on("click", ".cash-flow-drill-down", (e) => {
+			e.preventDefault();
+			const $link = $(e.currentTarget);
+			const period = $link.attr("data-period");
+			const column = report.columns.find((column) => column.fieldname === period);
+
+			new liquidity_planning.CashFlowDrillDown(report, {
+				section: $link.attr("data-section"),
+				period: period,
+				company: $link.attr("data-company"),
+				party: $link.attr("data-party"),
+				title: `${$link.attr("data-account")}: ${column ? column.label : period}`,
+			}).show();
+		});
+
+		frappe.realtime.on("cash_flow_forecast_ready", () => {
+			if (report.get_filter_value("run_in_background")) {
+				report.refresh();
+			}
+		});
+
+		report.page.add_inner_button(__("Export Documents"), () => {
+			frappe.prompt(
+				{
+					fieldname: "file_format",
+					label: __("File Format"),
+					fieldtype: "Select",
+					options: ["CSV", "Excel"],
+					default: "CSV",
+					reqd: 1,
+				},
+				({ file_format }) => {
+					const args = new URLSearchParams({
+						filters: JSON.stringify(report.get_filter_values()),
+						file_format: file_format,
+					});
+					window.open(
+						"/api/method/liquidity_planning.liquidity_planning.report.cash_flow_forecast.export.export_documents?" +
+							args.toString()
+					);
+				},
+				__("Export Documents"),
+				__("Export")
+			);
+		});
+	},
 	formatter: function (value, row, column, data, default_formatter) {
 
 		value = default_formatter(value, row, column, data);
@@ -20,6 +162,17 @@ frappe.query_reports["Cash Flow Forecast"] = {
 
 			value = $value.wrap("<p></p>").parent().html();
 
+		// Figures of sections with a party can be drilled down into
+		if (data && data.section && column.fieldtype === "Currency" && data[column.fieldname]) {
+			const escape = frappe.utils.escape_html;
+			value = `<a class="cash-flow-drill-down"
+				data-section="${escape(data.section)}"
+				data-period="${escape(column.fieldname)}"
+				data-company="${escape(data.company || "")}"
+				data-party="${escape(data.party || "")}"
+				data-account="${escape(data.account)}">${value}</a>`;
+		}
+
 
 		return value;
 	},
@@ -83,6 +236,7 @@ frappe.query_reports["Cash Flow Forecast"] = {
 			label: __("Periodicity"),
 			fieldtype: "Select",
 			options: [
+				{ value: "Weekly", label: __("Weekly") },
 				{ value: "Monthly", label: __("Monthly") },
 				{ value: "Quarterly", label: __("Quarterly") },
 				{ value: "Half-Yearly", label: __("Half-Yearly") },
@@ -98,5 +252,38 @@ frappe.query_reports["Cash Flow Forecast"] = {
 			options: ["EUR", "CAD"],
 			default: "EUR",
 		},
+		{
+			fieldname: "apply_payment_delays",
+			label: __("Apply Payment Delays"),
+			fieldtype: "Check",
+			default: 1,
+		},
+		{
+			fieldname: "group_by_party",
+			label: __("Group by Party"),
+			fieldtype: "Check",
+		},
+		{
+			fieldname: "top_parties",
+			label: __("Top Parties"),
+			fieldtype: "Int",
+			default: 10,
+			depends_on: "eval:doc.group_by_party",
+		},
+		{
+			fieldname: "recompute_live",
+			label: __("Recompute Live"),
+			fieldtype: "Check",
+		},
+		{
+			fieldname: "run_in_background",
+			label: __("Run in Background"),
+			fieldtype: "Check",
+		},
+		{
+			fieldname: "debug",
+			label: __("Show Profiling Information"),
+			fieldtype: "Check",
+		},
 	],
 };
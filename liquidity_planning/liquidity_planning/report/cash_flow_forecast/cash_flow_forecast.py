@@ -1,31 +1,117 @@
 # Copyright (c) 2023, ALYF GmbH and contributors
 # For license information, please see license.txt
 
+import hashlib
+import json
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+
 import frappe
+import numpy as np
 from erpnext.accounts.report.financial_statements import get_columns, get_period_list
-from erpnext.accounts.report.utils import convert
+from erpnext.setup.utils import get_exchange_rate
 from frappe import _
-from frappe.utils import today
+from frappe.query_builder import Case, Order
+from frappe.query_builder.functions import Abs, Sum
+from frappe.utils import add_days, cint, flt, format_datetime, formatdate, getdate, today
+
+from liquidity_planning.liquidity_planning.doctype.cash_flow_bucket.cash_flow_bucket import (
+	INVOICE_DOCTYPES,
+)
+from liquidity_planning.queries import (
+	get_expense_claims,
+	get_open_orders,
+	get_outstanding_invoices,
+)
+
+CACHE_KEY = "liquidity_planning:cash_flow_forecast"
+SERIES_KEY = "liquidity_planning:cash_flow_forecast_series"
+DATA_VERSION_KEY = "liquidity_planning:cash_flow_forecast_data_version"
+
+# Seconds to keep the daily series of a day, which are only read on that day
+SERIES_EXPIRY = 24 * 60 * 60
+
+# Average number of days per month, used to spread the monthly salaries
+DAYS_PER_MONTH = 30.438302988666667
+
+# Section and field of `CashFlowForecast.data` for each Cash Flow Bucket source
+BUCKET_SOURCES = {
+	"Sales Order": ("sales_orders", "amount"),
+	"Sales Invoice": ("sales_invoices", "amount"),
+	"Purchase Order": ("purchase_orders", "amount"),
+	"Purchase Invoice": ("purchase_invoices", "amount"),
+	"Expense Claim": ("expense_claims", "amount"),
+}
+
+# Sections that can be broken down by party
+PARTY_SECTIONS = ("sales_orders", "sales_invoices", "purchase_orders", "purchase_invoices")
+
+# Number of parties per section that get their own row, unless set in the filters
+TOP_PARTIES = 10
 
 
 class CashFlowForecast:
 	def __init__(self, filters):
 		self.filters = filters
 
-		self.time_periods = get_period_list(
-			filters.from_fiscal_year,
-			filters.to_fiscal_year,
-			filters.period_start_date,
-			filters.period_end_date,
-			filters.filter_based_on,
-			filters.periodicity,
-			company=filters.company,
-		)
+		if filters.periodicity == "Weekly":
+			self.time_periods = get_weekly_period_list(filters)
+		else:
+			self.time_periods = get_period_list(
+				filters.from_fiscal_year,
+				filters.to_fiscal_year,
+				filters.period_start_date,
+				filters.period_end_date,
+				filters.filter_based_on,
+				filters.periodicity,
+				company=filters.company,
+			)
 
 		self.filters.period_start_date = self.time_periods[0]["year_start_date"]
+
+		# The daily series cover `self.days` days starting at `self.start_date`
+		self.start_date = self.time_periods[0]["from_date"]
+		self.end_date = self.time_periods[-1]["to_date"]
+		self.days = (self.end_date - self.start_date).days + 1
+		self.period_starts = np.array(
+			[(period["from_date"] - self.start_date).days for period in self.time_periods]
+		)
+		self.period_ends = np.array(
+			[(period["to_date"] - self.start_date).days + 1 for period in self.time_periods]
+		)
+		self.period_keys = [period["key"] for period in self.time_periods]
 		self.company_filter = {"company": self.filters.company} if self.filters.company else {}
+		self.in_background = False
+
+		self.debug = bool(self.filters.get("debug") or frappe.conf.get("cash_flow_forecast_debug"))
+		self.stages = {}
+		self.conversions = 0
+
+	def widen_range(self, days):
+		"""Extend the daily series by `days` before and after the time periods."""
+		self.start_date = add_days(self.start_date, -days)
+		self.end_date = add_days(self.end_date, days)
+		self.days += 2 * days
+		self.period_starts = self.period_starts + days
+		self.period_ends = self.period_ends + days
 
 	def run(self):
+		"""Return the report result, from the cache if the filters have been used before."""
+		if self.debug:
+			return self.get_result()
+
+		cache_key = self.get_cache_key()
+		result = frappe.cache().hget(CACHE_KEY, cache_key)
+
+		if result is None:
+			result = self.get_result()
+			frappe.cache().hset(CACHE_KEY, cache_key, result)
+
+		return result
+
+	def get_result(self):
 		return (
 			self.get_columns(),
 			self.get_data(),
@@ -34,6 +120,62 @@ class CashFlowForecast:
 			self.get_report_summary(),
 		)
 
+	def get_cache_key(self):
+		"""Return a key identifying the result for the normalized filters.
+
+		Scheduled orders and exchange rates depend on the current date, and the
+		labels on the language, so both are part of the key as well.
+		"""
+		return json.dumps(
+			{
+				"company": self.filters.company,
+				"from_date": str(self.time_periods[0]["from_date"]),
+				"to_date": str(self.time_periods[-1]["to_date"]),
+				"periodicity": self.filters.periodicity,
+				"presentation_currency": self.filters.presentation_currency,
+				"apply_payment_delays": bool(self.filters.apply_payment_delays),
+				"top_parties": self.get_top_parties_count(),
+				"date": today(),
+				"lang": frappe.local.lang,
+			},
+			sort_keys=True,
+		)
+
+	def get_top_parties_count(self):
+		"""Return the number of parties per section that get their own row, if grouped by party."""
+		if not self.filters.group_by_party:
+			return 0
+
+		return cint(self.filters.top_parties) or TOP_PARTIES
+
+	def get_filters_hash(self):
+		"""Return a hash of the normalized filters, independent of the current date.
+
+		The language stays part of the hash, as snapshots contain translated labels.
+		"""
+		filters = json.loads(self.get_cache_key())
+		del filters["date"]
+		return hashlib.sha1(json.dumps(filters, sort_keys=True).encode()).hexdigest()
+
+	def get_snapshot_result(self):
+		"""Return the result of the latest snapshot taken today with the same filters, if any."""
+		snapshot = frappe.db.get_value(
+			"Cash Flow Forecast Snapshot",
+			{"filters_hash": self.get_filters_hash(), "creation": [">=", today()]},
+			["creation", "result"],
+			as_dict=True,
+			order_by="version desc",
+		)
+		if not snapshot:
+			return None
+
+		columns, data, message, chart, report_summary = json.loads(snapshot.result)
+		message = _("Snapshot of {0}. Check Recompute Live to see the current figures.").format(
+			format_datetime(snapshot.creation)
+		)
+
+		return columns, data, message, chart, report_summary
+
 	def get_columns(self):
 		columns = get_columns(
 			self.filters.periodicity,
@@ -54,44 +196,29 @@ class CashFlowForecast:
 		return columns
 
 	def get_data(self):
+		self.load_data()
+		return self.get_rows()
+
+	def get_rows(self):
+		"""Calculate the report rows from the loaded data."""
+		self.calculate_rows()
+
 		empty_row = {
 			"account": "",
 			"indent": 0.0,
 			"currency": self.filters.presentation_currency,
 		}
 
-		self.calculate_sales_orders_submitted_and_billed()
-		self.calculate_sales_orders_scheduled()
-		self.calculate_sales_orders()
-		self.calculate_sales_invoices()
-		self.calculate_income()
-
-		self.calculate_purchase_orders_submitted_and_billed()
-		self.calculate_purchase_orders_scheduled()
-		self.calculate_purchase_orders()
-		self.calcualte_purchase_invoices()
-		self.calcualte_salaries()
-		self.calculate_expense_claims()
-		self.calculate_expenses()
-
-		self.calculate_total_income()
-		self.calculate_total_expenses()
-		self.calculate_net_cash_flow()
-
-		self.calculate_totals()
-
-		return [
+		rows = [
 			self.income,
 			self.sales_orders,
-			self.sales_orders_submitted,
-			self.sales_orders_billed,
+			self.sales_orders_open,
 			self.sales_orders_scheduled,
 			self.sales_invoices,
 			empty_row,
 			self.expenses,
 			self.purchase_orders,
-			self.purchase_orders_submitted,
-			self.purchase_orders_billed,
+			self.purchase_orders_open,
 			self.purchase_orders_scheduled,
 			self.purchase_invoices,
 			self.salaries,
@@ -100,440 +227,626 @@ class CashFlowForecast:
 			self.total_income,
 			self.total_expenses,
 			self.net_cash_flow,
+			empty_row,
+			self.opening_balance,
+			self.closing_balance,
 		]
 
-	def calculate_income(self):
-		self.income = {
-			"account": _("Income"),
-			"indent": 0.0,
-			"is_group": 1,
-			"currency": self.filters.presentation_currency,
-			"bold": 1,
-		}
-
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.income.update({key: (self.sales_orders.get(key, 0)) + (self.sales_invoices.get(key, 0))})
-
-	def calculate_sales_orders(self):
-		self.sales_orders = {
-			"account": _("Sales Orders"),
-			"indent": 1.0,
-			"is_group": 1,
-			"currency": self.filters.presentation_currency,
-		}
-
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.sales_orders.update(
+		data = []
+		for row in rows:
+			data.append(self.get_row_dict(row))
+			data.extend(self.get_row_dict(child_row) for child_row in row.get("child_rows", []))
+
+		return data
+
+	def calculate_rows(self):
+		"""Calculate the values of every row, see `make_row`."""
+		for calculate in (
+			self.calculate_sales_orders_open,
+			self.calculate_sales_orders_scheduled,
+			self.calculate_sales_orders,
+			self.calculate_sales_invoices,
+			self.calculate_income,
+			self.calculate_purchase_orders_open,
+			self.calculate_purchase_orders_scheduled,
+			self.calculate_purchase_orders,
+			self.calcualte_purchase_invoices,
+			self.calcualte_salaries,
+			self.calculate_expense_claims,
+			self.calculate_expenses,
+			self.calculate_total_income,
+			self.calculate_total_expenses,
+			self.calculate_net_cash_flow,
+			self.calculate_cash_balances,
+			self.calculate_totals,
+		):
+			with self.measure(calculate.__name__):
+				calculate()
+
+		if self.debug:
+			frappe.logger("liquidity_planning").info(
 				{
-					key: (self.sales_orders_submitted.get(key, 0))
-					+ (self.sales_orders_billed.get(key, 0))
-					+ (self.sales_orders_scheduled.get(key, 0))
+					"report": "Cash Flow Forecast",
+					"filters": self.get_cache_key(),
+					"stages": self.stages,
 				}
 			)
 
-	def calculate_sales_orders_submitted_and_billed(self):
-		self.sales_orders_submitted = {
-			"account": _("Sales Orders (Submitted)"),
-			"indent": 2.0,
-			"currency": self.filters.presentation_currency,
-		}
+	def make_row(self, account, indent, values, total=None, **kwargs):
+		"""Return a row with one amount per time period in `values`.
 
-		self.sales_orders_billed = {
-			"account": _("Sales Orders (Billed)"),
-			"indent": 2.0,
+		The total defaults to the sum of `values`. Rows are only turned into
+		report rows, keyed by period, by `get_row_dict`.
+		"""
+		return {
+			"account": account,
+			"indent": float(indent),
 			"currency": self.filters.presentation_currency,
+			"values": values,
+			"total": float(values.sum()) if total is None else total,
+			**kwargs,
 		}
 
-		filters = self.company_filter.copy()
+	def get_row_dict(self, row):
+		if "values" not in row:
+			return row
 
-		amount_submitted_total = 0.0
-		amount_billed_total = 0.0
+		row_dict = {
+			key: value for key, value in row.items() if key not in ("values", "child_rows")
+		}
+		row_dict.update(zip(self.period_keys, row["values"].tolist()))
 
-		for period in self.time_periods:
-			amount_submitted = 0.0
-			amount_billed = 0.0
+		return row_dict
 
-			filters.update(
-				{
-					"status": ["not in", "Draft, Cancelled"],
-					"transaction_date": [
-						"between",
-						[period["from_date"], period["to_date"]],
-					],
-				}
-			)
+	def calculate_income(self):
+		self.income = self.make_row(
+			_("Income"),
+			0,
+			self.sales_orders["values"] + self.sales_invoices["values"],
+			is_group=1,
+			bold=1,
+		)
 
-			sales_orders = frappe.get_all(
-				"Sales Order",
-				filters=filters,
-				fields=[
-					"name",
-					"grand_total",
-					"per_billed",
-					"currency",
-				],
-			)
+	def calculate_sales_orders(self):
+		self.sales_orders = self.make_row(
+			_("Sales Orders"),
+			1,
+			self.sales_orders_open["values"] + self.sales_orders_scheduled["values"],
+			is_group=1,
+		)
 
-			for sales_order in sales_orders:
-				amount_submitted_tmp = sales_order["grand_total"]
-				amount_billed_tmp = sales_order["grand_total"] * sales_order["per_billed"] / 100
-
-				if self.filters.presentation_currency != sales_order.currency:
-					amount_submitted_tmp = convert(
-						amount_submitted_tmp,
-						self.filters.presentation_currency,
-						sales_order.currency,
-						today(),
-					)
-					amount_billed_tmp = convert(
-						amount_billed_tmp,
-						self.filters.presentation_currency,
-						sales_order.currency,
-						today(),
-					)
-
-				amount_submitted += amount_submitted_tmp
-				amount_submitted_total += amount_submitted_tmp
-				amount_billed -= amount_billed_tmp
-				amount_billed_total -= amount_billed_tmp
-
-				self.sales_orders_submitted.update({period["key"]: amount_submitted})
-				self.sales_orders_billed.update({period["key"]: amount_billed})
-
-		self.sales_orders_submitted.update({"total": amount_submitted_total})
-		self.sales_orders_billed.update({"total": amount_billed_total})
+	def calculate_sales_orders_open(self):
+		self.sales_orders_open = self.make_section_row(
+			_("Sales Orders (Open)"),
+			2,
+			self.data["sales_orders"],
+			self.party_data.get("sales_orders"),
+			section="sales_orders",
+		)
 
 	def calculate_sales_orders_scheduled(self):
-		self.sales_orders_scheduled = {
-			"account": _("Sales Orders (Scheduled)"),
-			"indent": 2.0,
-			"currency": self.filters.presentation_currency,
-		}
-
-		amount_total = 0.0
-
-		for period in self.time_periods:
-			amount = 0.0
+		self.sales_orders_scheduled = self.make_section_row(
+			_("Sales Orders (Scheduled)"), 2, self.data["sales_orders_scheduled"]
+		)
 
-			filters = {
-				"status": ["=", "Active"],
-				"reference_doctype": ["=", "Sales Order"],
-			}
+	def calculate_sales_invoices(self):
+		self.sales_invoices = self.make_section_row(
+			_("Sales Invoices"),
+			1,
+			self.data["sales_invoices"],
+			self.party_data.get("sales_invoices"),
+			section="sales_invoices",
+		)
 
-			auto_repeats = frappe.get_all(
-				"Auto Repeat",
-				filters=filters,
-				fields=[
-					"name",
-					"reference_document",
-				],
-			)
+	def calculate_expenses(self):
+		self.expenses = self.make_row(
+			_("Expenses"),
+			0,
+			self.purchase_orders["values"]
+			+ self.purchase_invoices["values"]
+			+ self.salaries["values"]
+			+ self.expense_claims["values"],
+			is_group=1,
+			bold=1,
+		)
 
-			for auto_repeat in auto_repeats:
-				auto_repeat_doc = frappe.get_doc("Auto Repeat", auto_repeat.name)
-				sales_order = frappe.get_doc("Sales Order", auto_repeat.reference_document)
+	def calculate_purchase_orders(self):
+		self.purchase_orders = self.make_row(
+			_("Purchase Orders"),
+			1,
+			self.purchase_orders_open["values"] + self.purchase_orders_scheduled["values"],
+			is_group=1,
+		)
 
-				if self.filters.company and sales_order.company != self.filters.company:
-					break
+	def calculate_purchase_orders_open(self):
+		self.purchase_orders_open = self.make_section_row(
+			_("Purchase Orders (Open)"),
+			2,
+			self.data["purchase_orders"],
+			self.party_data.get("purchase_orders"),
+			section="purchase_orders",
+		)
 
-				schedule_details = auto_repeat_doc.get_auto_repeat_schedule()
+	def calculate_purchase_orders_scheduled(self):
+		self.purchase_orders_scheduled = self.make_section_row(
+			_("Purchase Orders (Scheduled)"), 2, self.data["purchase_orders_scheduled"]
+		)
 
-				amount_tmp = 0.0
+	def calcualte_purchase_invoices(self):
+		self.purchase_invoices = self.make_section_row(
+			_("Purchase Invoices"),
+			1,
+			self.data["purchase_invoices"],
+			self.party_data.get("purchase_invoices"),
+			section="purchase_invoices",
+		)
 
-				for schedule_detail in schedule_details:
-					if period["from_date"] <= schedule_detail["next_scheduled_date"] <= period["to_date"]:
-						amount_tmp += sales_order.grand_total
+	def calcualte_salaries(self):
+		self.salaries = self.make_section_row(_("Salaries"), 1, self.data["salaries"])
 
-				if self.filters.presentation_currency != sales_order.currency:
-					amount_tmp = convert(
-						amount_tmp,
-						self.filters.presentation_currency,
-						sales_order.currency,
-						today(),
-					)
+	def calculate_expense_claims(self):
+		self.expense_claims = self.make_section_row(
+			_("Expense Claims"), 1, self.data["expense_claims"]
+		)
 
-				amount += amount_tmp
-				amount_total += amount_tmp
+	def calculate_total_income(self):
+		self.total_income = self.make_row(_("Total Income"), 0, self.income["values"], bold=1)
 
-				self.sales_orders_scheduled.update({period["key"]: amount})
+	def calculate_total_expenses(self):
+		self.total_expenses = self.make_row(
+			_("Total Expenses"), 0, self.expenses["values"], bold=1
+		)
 
-		self.sales_orders_scheduled.update({"total": amount_total})
+	def calculate_net_cash_flow(self):
+		self.net_cash_flow = self.make_row(
+			_("Net Cash Flow"),
+			0,
+			self.income["values"] - self.expenses["values"],
+			warn_if_negative=1,
+			bold=1,
+		)
 
-	def calculate_sales_invoices(self):
-		self.sales_invoices = {
-			"account": _("Sales Invoices"),
-			"indent": 1.0,
-			"currency": self.filters.presentation_currency,
-		}
+	def calculate_cash_balances(self):
+		"""Project the balance of all bank and cash accounts, period by period.
 
-		filters = self.company_filter.copy()
+		Starts with the current balance before the first period and adds up the
+		net cash flow of each period.
+		"""
+		balance = sum(self.convert(row.amount, row.currency) for row in self.cash_balances)
+		closing_balance = balance + np.cumsum(self.net_cash_flow["values"])
+		opening_balance = closing_balance - self.net_cash_flow["values"]
 
-		amount_total = 0.0
+		self.opening_balance = self.make_row(
+			_("Opening Balance"), 0, opening_balance, total=balance, warn_if_negative=1
+		)
+		self.closing_balance = self.make_row(
+			_("Closing Balance"),
+			0,
+			closing_balance,
+			total=float(closing_balance[-1]),
+			warn_if_negative=1,
+			bold=1,
+		)
 
-		for period in self.time_periods:
-			amount = 0.0
+	def calculate_totals(self):
+		pass
 
-			filters.update(
-				{
-					"status": ["not in", "Draft, Cancelled"],
-					"due_date": [
-						"between",
-						[period["from_date"], period["to_date"]],
-					],
-				}
-			)
+	def load_data(self):
+		"""Load the daily series of all sources and sum them up per period and currency."""
+		self.series = None if self.debug else self.get_cached_series()
 
-			sales_invoices = frappe.get_all(
-				"Sales Invoice",
-				filters=filters,
-				fields=[
-					"name",
-					"grand_total",
-					"currency",
-				],
+		if self.series is None:
+			self.series = self.load_series()
+			series_key = get_series_key()
+			frappe.cache().hset(
+				series_key, self.get_series_cache_key(self.start_date, self.end_date), self.series
 			)
+			frappe.cache().expire(frappe.cache().make_key(series_key), SERIES_EXPIRY)
 
-			for sales_invoice in sales_invoices:
-				amount_tmp = sales_invoice["grand_total"]
-
-				if self.filters.presentation_currency != sales_invoice.currency:
-					amount_tmp = convert(
-						amount_tmp,
-						self.filters.presentation_currency,
-						sales_invoice.currency,
-						today(),
-					)
+		self.data = {
+			section: self.get_amounts_by_period(series) for section, series in self.series.items()
+		}
 
-				amount += amount_tmp
-				amount_total += amount_tmp
+		with self.measure("load_cash_balances"):
+			self.cash_balances = self.get_cash_balances()
 
-				self.sales_invoices.update({period["key"]: amount})
+		with self.measure("load_exchange_rates"):
+			self.load_exchange_rates(
+				{currency for series in self.series.values() for _company, currency in series}
+				| {row.currency for row in self.cash_balances}
+			)
 
-		self.sales_invoices.update({"total": amount_total})
+		self.party_data = {}
+		if self.filters.group_by_party:
+			with self.measure("load_parties"):
+				self.party_data = self.load_party_data()
+
+	def load_party_data(self):
+		"""Load the amounts per period of the top parties of every section that has a party.
+
+		Always loaded from the source documents, as neither buckets nor cached
+		series know the party.
+		"""
+		loaders = self.get_loaders()
+		party_data = {}
+
+		for section in PARTY_SECTIONS:
+			label, method, doctype = loaders[section]
+			party_data[section] = {
+				party: self.get_amounts_by_period(series)
+				for party, series in method(doctype, by_party=True).items()
+			}
 
-	def calculate_expenses(self):
-		self.expenses = {
-			"account": _("Expenses"),
-			"indent": 0.0,
-			"is_group": 1,
-			"currency": self.filters.presentation_currency,
-			"bold": 1,
-		}
+		return party_data
+
+	def load_series(self):
+		"""Load the daily amounts of all sources per section, company, currency and field."""
+		if frappe.conf.get("cash_flow_forecast_use_buckets"):
+			with self.measure("load_buckets"):
+				series = self.get_buckets_by_day()
+
+			if self.filters.apply_payment_delays:
+				# Buckets don't know the party, so invoices are loaded from the source
+				series.pop("sales_invoices", None)
+				series.pop("purchase_invoices", None)
+		else:
+			series = {}
+
+		loaders = self.get_loaders()
+		pending = [section for section in loaders if section not in series]
+		max_workers = cint(frappe.conf.get("cash_flow_forecast_threads"))
+
+		if max_workers > 1 and len(pending) > 1:
+			series.update(self.load_sections_in_parallel(loaders, pending, max_workers))
+		else:
+			for done, section in enumerate(pending, 1):
+				label, method, *args = loaders[section]
+				with self.measure(f"load_{section}"):
+					series[section] = method(*args)
+				self.publish_progress(done, len(pending), label)
+
+		return series
+
+	def get_series_cache_key(self, from_date, to_date):
+		return json.dumps(
+			{
+				"company": self.filters.company,
+				"from_date": str(from_date),
+				"to_date": str(to_date),
+				"use_buckets": bool(frappe.conf.get("cash_flow_forecast_use_buckets")),
+				"apply_payment_delays": bool(self.filters.apply_payment_delays),
+			},
+			sort_keys=True,
+		)
 
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.expenses.update(
-				{
-					key: (self.purchase_orders.get(key, 0))
-					+ (self.purchase_invoices.get(key, 0))
-					+ (self.salaries.get(key, 0))
-					+ (self.expense_claims.get(key, 0))
+	def get_cached_series(self):
+		"""Return the daily series from a cached run whose date range covers the current one.
+
+		Only the periodicity and the date range may differ, so the series of the
+		current range is a slice of the cached one.
+		"""
+		series_key = get_series_key()
+		for cache_key in frappe.cache().hkeys(series_key):
+			cache_key = frappe.safe_decode(cache_key)
+			from_date = getdate(json.loads(cache_key)["from_date"])
+			to_date = getdate(json.loads(cache_key)["to_date"])
+
+			if not (from_date <= self.start_date and self.end_date <= to_date):
+				continue
+			if cache_key != self.get_series_cache_key(from_date, to_date):
+				continue
+
+			series = frappe.cache().hget(series_key, cache_key)
+			if series is None:
+				continue
+
+			offset = (self.start_date - from_date).days
+			return {
+				section: {
+					key: {
+						fieldname: array[offset : offset + self.days]
+						for fieldname, array in arrays.items()
+					}
+					for key, arrays in section_series.items()
 				}
-			)
+				for section, section_series in series.items()
+			}
 
-	def calculate_purchase_orders(self):
-		self.purchase_orders = {
-			"account": _("Purchase Orders"),
-			"indent": 1.0,
-			"is_group": 1,
-			"currency": self.filters.presentation_currency,
-		}
+	def get_amounts_by_period(self, series):
+		"""Sum up the daily `series` per period, using cumulative sums.
 
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.purchase_orders.update(
-				{
-					key: (self.purchase_orders_submitted.get(key, 0))
-					+ (self.purchase_orders_billed.get(key, 0))
-					+ (self.purchase_orders_scheduled.get(key, 0))
-				}
-			)
+		Returns an array of amounts per period for every company, currency and field.
+		"""
+		amounts = {}
 
-	def calculate_purchase_orders_submitted_and_billed(self):
-		self.purchase_orders_submitted = {
-			"account": _("Purchase Orders (Submitted)"),
-			"indent": 2.0,
-			"currency": self.filters.presentation_currency,
-		}
+		for key, arrays in series.items():
+			amounts[key] = {}
+			for fieldname, array in arrays.items():
+				cumulative = np.concatenate(([0.0], np.cumsum(array)))
+				amounts[key][fieldname] = (
+					cumulative[self.period_ends] - cumulative[self.period_starts]
+				)
 
-		self.purchase_orders_billed = {
-			"account": _("Purchase Orders (Billed)"),
-			"indent": 2.0,
-			"currency": self.filters.presentation_currency,
-		}
+		return amounts
 
-		filters = self.company_filter.copy()
+	def get_series(self, rows, fieldnames=("amount",)):
+		"""Sum up `rows` with a `posting_date` into an array per company, currency and field.
 
-		amount_submitted_total = 0.0
-		amount_billed_total = 0.0
+		The arrays are indexed by the offset in days from the start date.
+		"""
+		series = {}
 
-		for period in self.time_periods:
-			amount_submitted = 0.0
-			amount_billed = 0.0
+		for row in rows:
+			offset = (getdate(row.posting_date) - self.start_date).days
+			if not 0 <= offset < self.days:
+				continue
 
-			filters.update(
-				{
-					"status": ["not in", "Draft, Cancelled"],
-					"transaction_date": [
-						"between",
-						[period["from_date"], period["to_date"]],
-					],
-				}
-			)
-
-			purchase_orders = frappe.get_all(
-				"Purchase Order",
-				filters=filters,
-				fields=[
-					"name",
-					"grand_total",
-					"per_billed",
-					"currency",
-				],
+			arrays = series.setdefault(
+				(row.company, row.currency),
+				{fieldname: np.zeros(self.days) for fieldname in fieldnames},
 			)
+			for fieldname in fieldnames:
+				arrays[fieldname][offset] += flt(row.get(fieldname))
 
-			for purchase_order in purchase_orders:
-				amount_submitted_tmp = purchase_order["grand_total"]
-				amount_billed_tmp = purchase_order["grand_total"] * purchase_order["per_billed"] / 100
-
-				if self.filters.presentation_currency != purchase_order.currency:
-					amount_submitted_tmp = convert(
-						amount_submitted_tmp,
-						self.filters.presentation_currency,
-						purchase_order.currency,
-						today(),
-					)
-					amount_billed_tmp = convert(
-						amount_billed_tmp,
-						self.filters.presentation_currency,
-						purchase_order.currency,
-						today(),
-					)
-
-				amount_submitted += amount_submitted_tmp
-				amount_submitted_total += amount_submitted_tmp
-				amount_billed -= amount_billed_tmp
-				amount_billed_total -= amount_billed_tmp
-
-				self.purchase_orders_submitted.update({period["key"]: amount_submitted})
-				self.purchase_orders_billed.update({period["key"]: amount_billed})
-
-		self.purchase_orders_submitted.update({"total": amount_submitted_total})
-		self.purchase_orders_billed.update({"total": amount_billed_total})
+		return series
 
-	def calculate_purchase_orders_scheduled(self):
-		self.purchase_orders_scheduled = {
-			"account": _("Purchase Orders (Scheduled)"),
-			"indent": 2.0,
-			"currency": self.filters.presentation_currency,
+	def get_loaders(self):
+		"""Return the label, method and arguments that load the daily series of each section."""
+		return {
+			"sales_orders": (_("Sales Orders"), self.get_orders_by_day, "Sales Order"),
+			"sales_orders_scheduled": (
+				_("Sales Orders (Scheduled)"),
+				self.get_scheduled_orders_by_day,
+				"Sales Order",
+			),
+			"sales_invoices": (_("Sales Invoices"), self.get_invoices_by_day, "Sales Invoice"),
+			"purchase_orders": (_("Purchase Orders"), self.get_orders_by_day, "Purchase Order"),
+			"purchase_orders_scheduled": (
+				_("Purchase Orders (Scheduled)"),
+				self.get_scheduled_orders_by_day,
+				"Purchase Order",
+			),
+			"purchase_invoices": (
+				_("Purchase Invoices"),
+				self.get_invoices_by_day,
+				"Purchase Invoice",
+			),
+			"salaries": (_("Salaries"), self.get_salaries_by_day),
+			"expense_claims": (_("Expense Claims"), self.get_expense_claims_by_day),
 		}
 
-		amount_total = 0.0
-
-		for period in self.time_periods:
-			amount = 0.0
-
-			filters = {
-				"status": ["=", "Active"],
-				"reference_doctype": ["=", "Purchase Order"],
-			}
+	def load_sections_in_parallel(self, loaders, sections, max_workers):
+		"""Load `sections` concurrently, each thread with its own site context and connection."""
+		site = frappe.local.site
+		sites_path = frappe.local.sites_path
+		user = frappe.session.user
+		lang = frappe.local.lang
+
+		def load(section):
+			frappe.init(site=site, sites_path=sites_path)
+			try:
+				frappe.connect()
+				frappe.set_user(user)
+				frappe.local.lang = lang
+				label, method, *args = loaders[section]
+				with self.measure(f"load_{section}"):
+					return method(*args)
+			finally:
+				frappe.destroy()
+
+		series = {}
+		with ThreadPoolExecutor(max_workers=max_workers) as executor:
+			futures = {executor.submit(load, section): section for section in sections}
+			for done, future in enumerate(as_completed(futures), 1):
+				section = futures[future]
+				series[section] = future.result()
+				self.publish_progress(done, len(sections), loaders[section][0])
+
+		return series
+
+	@contextmanager
+	def measure(self, stage):
+		"""Record wall time, SQL queries, rows fetched and conversions of `stage` in debug mode."""
+		if not self.debug:
+			yield
+			return
+
+		stats = self.stages.setdefault(
+			stage,
+			{"time": 0.0, "queries": 0, "query_time": 0.0, "rows": 0, "conversions": 0},
+		)
+		sql = frappe.db.sql
+
+		def measured_sql(*args, **kwargs):
+			start = time.perf_counter()
+			result = sql(*args, **kwargs)
+			stats["query_time"] += time.perf_counter() - start
+			stats["queries"] += 1
+			if isinstance(result, (list, tuple)):
+				stats["rows"] += len(result)
+			return result
+
+		frappe.db.sql = measured_sql
+		conversions = self.conversions
+		start = time.perf_counter()
+		try:
+			yield
+		finally:
+			stats["time"] += time.perf_counter() - start
+			stats["conversions"] += self.conversions - conversions
+			frappe.db.sql = sql
+
+	def publish_progress(self, done, total, label):
+		"""Report the progress to the user when running in the background."""
+		if not self.in_background:
+			return
+
+		frappe.publish_progress(
+			done * 100 / total,
+			title=_("Cash Flow Forecast"),
+			description=_("Loaded {0}").format(label),
+		)
 
-			auto_repeats = frappe.get_all(
-				"Auto Repeat",
-				filters=filters,
-				fields=[
-					"name",
-					"reference_document",
-				],
+	def get_buckets_by_day(self):
+		"""Return the daily series of the sections stored in Cash Flow Buckets.
+
+		Buckets of invoices are kept on the due dates, so overdue amounts are
+		moved to today here, like in `get_invoices_by_day`.
+		"""
+		bucket = frappe.qb.DocType("Cash Flow Bucket")
+		overdue_date = getdate(today())
+
+		query = (
+			frappe.qb.from_(bucket)
+			.select(
+				bucket.source,
+				bucket.posting_date,
+				bucket.company,
+				bucket.currency,
+				Sum(bucket.amount).as_("amount"),
 			)
+			.where(
+				bucket.posting_date.between(self.start_date, self.end_date)
+				| (bucket.source.isin(INVOICE_DOCTYPES) & (bucket.posting_date < overdue_date))
+			)
+			.groupby(bucket.source, bucket.posting_date, bucket.company, bucket.currency)
+		)
 
-			for auto_repeat in auto_repeats:
-				auto_repeat_doc = frappe.get_doc("Auto Repeat", auto_repeat.name)
-				purchase_order = frappe.get_doc("Purchase Order", auto_repeat.reference_document)
-
-				if self.filters.company and purchase_order.company != self.filters.company:
-					break
+		if self.filters.company:
+			query = query.where(bucket.company == self.filters.company)
 
-				schedule_details = auto_repeat_doc.get_auto_repeat_schedule()
+		rows = defaultdict(list)
+		fieldnames = defaultdict(list)
+		for section, fieldname in BUCKET_SOURCES.values():
+			fieldnames[section].append(fieldname)
 
-				amount_tmp = 0.0
+		for row in query.run(as_dict=True):
+			posting_date = row.posting_date
+			if row.source in INVOICE_DOCTYPES:
+				posting_date = max(posting_date, overdue_date)
+				if not (self.start_date <= posting_date <= self.end_date):
+					continue
 
-				for schedule_detail in schedule_details:
-					if period["from_date"] <= schedule_detail["next_scheduled_date"] <= period["to_date"]:
-						amount_tmp += purchase_order.grand_total
+			section, fieldname = BUCKET_SOURCES[row.source]
+			rows[section].append(
+				frappe._dict(
+					{
+						"posting_date": posting_date,
+						"company": row.company,
+						"currency": row.currency,
+						fieldname: row.amount,
+					}
+				)
+			)
 
-				if self.filters.presentation_currency != purchase_order.currency:
-					amount_tmp = convert(
-						amount_tmp,
-						self.filters.presentation_currency,
-						purchase_order.currency,
-						today(),
-					)
+		return {
+			section: self.get_series(rows[section], fieldnames[section]) for section in fieldnames
+		}
 
-				amount += amount_tmp
-				amount_total += amount_tmp
+	def get_orders_by_day(self, doctype, by_party=False):
+		"""Return the daily series of the unbilled amounts of open orders of `doctype`.
 
-				self.purchase_orders_scheduled.update({period["key"]: amount})
+		See `liquidity_planning.queries.get_open_orders`.
+		"""
+		return self.get_documents_by_day(get_open_orders(doctype, self.filters.company), by_party)
 
-		self.purchase_orders_scheduled.update({"total": amount_total})
+	def get_invoices_by_day(self, doctype, by_party=False):
+		"""Return the daily series of the outstanding amounts of `doctype`.
 
-	def calcualte_purchase_invoices(self):
-		self.purchase_invoices = {
-			"account": _("Purchase Invoices"),
-			"indent": 1.0,
-			"currency": self.filters.presentation_currency,
-		}
+		Overdue amounts are expected today. See
+		`liquidity_planning.queries.get_outstanding_invoices`.
+		"""
+		documents = get_outstanding_invoices(
+			doctype,
+			self.filters.company,
+			self.filters.apply_payment_delays,
+			overdue_date=today(),
+		)
+		return self.get_documents_by_day(documents, by_party)
+
+	def get_documents_by_day(self, documents, by_party=False):
+		"""Return the daily series of `documents`, a query of `liquidity_planning.queries`.
+
+		With `by_party`, returns the daily series per party instead (see
+		`group_by_party`).
+		"""
+		query = (
+			frappe.qb.from_(documents)
+			.select(
+				documents.posting_date,
+				documents.company,
+				documents.currency,
+				Sum(documents.amount).as_("amount"),
+			)
+			.where(documents.posting_date.between(self.start_date, self.end_date))
+			.groupby(documents.posting_date, documents.company, documents.currency)
+		)
 
-		filters = self.company_filter.copy()
+		if by_party:
+			return self.get_series_by_party(
+				self.group_by_party(query, documents.party).run(as_dict=True)
+			)
 
-		amount_total = 0.0
+		return self.get_series(query.run(as_dict=True))
+
+	def group_by_party(self, query, party):
+		"""Group the daily amounts of `query` by `party` as well.
+
+		The parties with the largest absolute amounts, converted to the
+		presentation currency, are ranked in SQL. Only the top parties are
+		kept, all others are grouped together as "Other" (a `party` of None).
+		"""
+		currencies = {currency for series in self.series.values() for _company, currency in series}
+		ranked = query.select(party.as_("party")).groupby(party)
+		top_parties = (
+			frappe.qb.from_(ranked)
+			.select(ranked.party)
+			.groupby(ranked.party)
+			.orderby(
+				Sum(Abs(ranked.amount) * self.get_conversion_factor(ranked.currency, currencies)),
+				order=Order.desc,
+			)
+			.limit(self.get_top_parties_count())
+		).run(pluck=True)
 
-		for period in self.time_periods:
-			amount = 0.0
+		if not top_parties:
+			return ranked
 
-			filters.update(
-				{
-					"status": ["not in", "Draft, Cancelled"],
-					"due_date": [
-						"between",
-						[period["from_date"], period["to_date"]],
-					],
-				}
-			)
+		party_or_other = Case().when(party.isin(top_parties), party).else_(None)
+		return query.select(party_or_other.as_("party")).groupby(party_or_other)
 
-			purchase_invoices = frappe.get_all(
-				"Purchase Invoice",
-				filters=filters,
-				fields=[
-					"name",
-					"grand_total",
-					"currency",
-				],
-			)
+	def get_conversion_factor(self, currency, currencies):
+		"""Return a SQL expression that converts amounts in the `currency` column.
 
-			for purchase_invoice in purchase_invoices:
-				amount_tmp = purchase_invoice["grand_total"]
+		`currencies` are the values the column can take.
+		"""
+		currencies = set(currencies) - {self.filters.presentation_currency, None}
+		if not currencies:
+			return 1
 
-				if self.filters.presentation_currency != purchase_invoice.currency:
-					amount_tmp = convert(
-						amount_tmp,
-						self.filters.presentation_currency,
-						purchase_invoice.currency,
-						today(),
-					)
+		factor = Case()
+		for code in sorted(currencies):
+			factor = factor.when(
+				currency == code,
+				1 / self.get_exchange_rate(self.filters.presentation_currency, code, today()),
+			)
 
-				amount += amount_tmp
-				amount_total += amount_tmp
+		return factor.else_(1)
 
-				self.purchase_invoices.update({period["key"]: amount})
+	def get_series_by_party(self, rows):
+		"""Return the daily series of `rows` per party, see `get_series`."""
+		rows_by_party = defaultdict(list)
+		for row in rows:
+			rows_by_party[row.party].append(row)
 
-		self.purchase_invoices.update({"total": amount_total})
+		return {party: self.get_series(party_rows) for party, party_rows in rows_by_party.items()}
 
-	def calcualte_salaries(self):
-		self.salaries = {
-			"account": _("Salaries"),
-			"indent": 1.0,
-			"currency": self.filters.presentation_currency,
-		}
+	def get_salaries_by_day(self):
+		"""Return the daily series of the salaries of all employees.
 
+		Every employee costs `ctc` divided by the average number of days per
+		month for each day between joining and relieving.
+		"""
 		filters = self.company_filter.copy()
 		filters.update(
 			{
@@ -546,6 +859,7 @@ class CashFlowForecast:
 			filters=filters,
 			fields=[
 				"name",
+				"company",
 				"ctc",
 				"salary_currency",
 				"date_of_joining",
@@ -553,127 +867,314 @@ class CashFlowForecast:
 			],
 		)
 
-		amount_total = 0.0
+		if not employees:
+			return {}
 
-		for period in self.time_periods:
-			amount = 0.0
+		start_date = np.datetime64(self.start_date, "D")
+		date_of_joining = np.array(
+			[employee.date_of_joining for employee in employees], dtype="datetime64[D]"
+		)
+		relieving_date = np.array(
+			[employee.relieving_date or self.end_date for employee in employees],
+			dtype="datetime64[D]",
+		)
+		ctc = np.array([flt(employee.ctc) for employee in employees])
+		daily_salary = ctc / DAYS_PER_MONTH
+		company = np.array([employee.company for employee in employees], dtype=object)
+		salary_currency = np.array(
+			[employee.salary_currency for employee in employees], dtype=object
+		)
 
-			for employee in employees:
-				if employee["date_of_joining"] > period["to_date"]:
-					continue
-				if employee["relieving_date"] and employee["relieving_date"] < period["from_date"]:
-					continue
+		# First and last day offset (exclusive) of the employment within the range
+		first_day = np.clip((date_of_joining - start_date).astype(int), 0, self.days)
+		last_day = np.clip((relieving_date - start_date).astype(int) + 1, 0, self.days)
+		employed = last_day > first_day
+
+		series = {}
+		for key in set(zip(company, salary_currency)):
+			mask = employed & (company == key[0]) & (salary_currency == key[1])
+			changes = np.zeros(self.days + 1)
+			np.add.at(changes, first_day[mask], daily_salary[mask])
+			np.add.at(changes, last_day[mask], -daily_salary[mask])
+			series[key] = {"amount": np.cumsum(changes[:-1])}
+
+		return series
+
+	def get_expense_claims_by_day(self):
+		"""Return the daily series of the claimed amounts of all expense claims."""
+		return self.get_documents_by_day(get_expense_claims(self.filters.company))
+
+	def get_cash_balances(self):
+		"""Return the balance of all bank and cash accounts before the first period, per currency.
+
+		Amounts are summed up in the company currency, so that one aggregate
+		query covers all companies.
+		"""
+		gl_entry = frappe.qb.DocType("GL Entry")
+		account = frappe.qb.DocType("Account")
+		company = frappe.qb.DocType("Company")
+
+		query = (
+			frappe.qb.from_(gl_entry)
+			.join(account)
+			.on(account.name == gl_entry.account)
+			.join(company)
+			.on(company.name == gl_entry.company)
+			.select(
+				company.default_currency.as_("currency"),
+				Sum(gl_entry.debit - gl_entry.credit).as_("amount"),
+			)
+			.where(account.account_type.isin(["Bank", "Cash"]))
+			.where(gl_entry.is_cancelled == 0)
+			.where(gl_entry.posting_date < self.time_periods[0]["from_date"])
+			.groupby(company.default_currency)
+		)
 
-				start_date = max(employee.date_of_joining, period.from_date)
-				end_date = min(employee.relieving_date or period.to_date, period.to_date)
-				tmp = ((end_date - start_date).days + 1) / 30.438302988666667 * employee.ctc
-				if self.filters.presentation_currency != employee.salary_currency:
-					tmp = convert(
-						tmp,
-						self.filters.presentation_currency,
-						employee.salary_currency,
-						today(),
-					)
-				amount += tmp
-				amount_total += tmp
+		if self.filters.company:
+			query = query.where(gl_entry.company == self.filters.company)
 
-			self.salaries.update({period["key"]: amount})
+		return query.run(as_dict=True)
 
-		self.salaries.update({"total": amount_total})
+	def get_scheduled_orders_by_day(self, doctype, names=None):
+		"""Return the daily series of the amounts of `doctype` scheduled by Auto Repeat.
 
-	def calculate_expense_claims(self):
-		self.expense_claims = {
-			"account": _("Expense Claims"),
-			"indent": 1.0,
-			"currency": self.filters.presentation_currency,
+		All Auto Repeats, or only those in `names`, and their reference orders
+		are loaded in bulk and each schedule is computed once.
+		"""
+		filters = {
+			"status": "Active",
+			"reference_doctype": doctype,
 		}
+		if names is not None:
+			filters["name"] = ["in", names]
 
-		filters = self.company_filter.copy()
-
-		amount_total = 0.0
+		auto_repeats = frappe.get_all(
+			"Auto Repeat",
+			filters=filters,
+			fields=[
+				"name",
+				"reference_doctype",
+				"reference_document",
+				"start_date",
+				"end_date",
+				"frequency",
+				"repeat_on_day",
+				"repeat_on_last_day",
+				"next_schedule_date",
+			],
+		)
 
-		for period in self.time_periods:
-			amount = 0.0
+		if not auto_repeats:
+			return {}
 
-			filters.update(
-				{
-					"status": ["not in", "Rejected, Cancelled"],
-					"posting_date": [
-						"between",
-						[period["from_date"], period["to_date"]],
-					],
-				}
-			)
+		filters = self.company_filter.copy()
+		filters.update(
+			{
+				"name": ["in", {auto_repeat.reference_document for auto_repeat in auto_repeats}],
+			}
+		)
 
-			expense_claims = frappe.get_all(
-				"Expense Claim",
+		orders = {
+			order.name: order
+			for order in frappe.get_all(
+				doctype,
 				filters=filters,
 				fields=[
 					"name",
-					"total_claimed_amount",
 					"company",
+					"grand_total",
+					"currency",
 				],
 			)
+		}
 
-			for expense_claim in expense_claims:
-				amount_tmp = expense_claim["total_claimed_amount"]
+		repeat_on_days = defaultdict(list)
+		for repeat_on_day in frappe.get_all(
+			"Auto Repeat Day",
+			filters={
+				"parenttype": "Auto Repeat",
+				"parent": ["in", [auto_repeat.name for auto_repeat in auto_repeats]],
+			},
+			fields=["parent", "day"],
+			order_by="idx",
+		):
+			repeat_on_days[repeat_on_day.parent].append({"day": repeat_on_day.day})
+
+		rows = []
+
+		for auto_repeat in auto_repeats:
+			order = orders.get(auto_repeat.reference_document)
+			if not order:
+				# The order belongs to another company
+				continue
+
+			auto_repeat_doc = frappe.get_doc(
+				dict(
+					auto_repeat,
+					doctype="Auto Repeat",
+					repeat_on_days=repeat_on_days[auto_repeat.name],
+				)
+			)
 
-				currency = frappe.get_value("Company", expense_claim.company, "default_currency")
+			rows.extend(
+				frappe._dict(
+					posting_date=schedule_detail["next_scheduled_date"],
+					company=order.company,
+					currency=order.currency,
+					amount=order.grand_total,
+				)
+				for schedule_detail in auto_repeat_doc.get_auto_repeat_schedule()
+			)
+
+		return self.get_series(rows)
+
+	def get_amounts(self, amounts, fieldname="amount"):
+		"""Sum up `fieldname` of the per-period `amounts` of all companies and currencies.
+
+		Each currency is converted to the presentation currency as a whole.
+		"""
+		values = np.zeros(len(self.time_periods))
+
+		for (company, currency), arrays in amounts.items():
+			values += self.convert_values(arrays[fieldname], currency)
+
+		return values
+
+	def make_section_row(
+		self, account, indent, amounts, party_amounts=None, fieldname="amount", **kwargs
+	):
+		"""Return the row of a section, with a sub-row per party or company.
+
+		Sections with `party_amounts` get a sub-row per top party, largest first,
+		followed by "Other". Otherwise, if no company is selected, every
+		company gets a sub-row. `kwargs` are set on the row and its sub-rows,
+		except for "Other".
+		"""
+		row = self.make_row(account, indent, self.get_amounts(amounts, fieldname), **kwargs)
+
+		if party_amounts:
+			party_rows = [
+				self.make_row(
+					party, indent + 1, self.get_amounts(series, fieldname), party=party, **kwargs
+				)
+				for party, series in party_amounts.items()
+				if party is not None
+			]
+			party_rows.sort(key=lambda party_row: -abs(party_row["total"]))
+
+			if None in party_amounts:
+				other_values = self.get_amounts(party_amounts[None], fieldname)
+				party_rows.append(self.make_row(_("Other"), indent + 1, other_values))
+
+			row["child_rows"] = party_rows
+		elif not self.filters.company:
+			amounts_by_company = defaultdict(dict)
+			for (company, currency), arrays in amounts.items():
+				amounts_by_company[company][(company, currency)] = arrays
+
+			row["child_rows"] = [
+				self.make_row(
+					company,
+					indent + 1,
+					self.get_amounts(company_amounts, fieldname),
+					company=company,
+					**kwargs,
+				)
+				for company, company_amounts in sorted(amounts_by_company.items())
+			]
+
+		return row
+
+	def load_exchange_rates(self, currencies):
+		"""Load the exchange rates from the presentation currency to `currencies` with one query.
+
+		Mirrors the lookup of `erpnext.setup.utils.get_exchange_rate`, which is
+		still used for rates that are not stored in Currency Exchange.
+		"""
+		self.exchange_rates = {}
+
+		currencies = currencies - {self.filters.presentation_currency, None}
+		if not currencies:
+			return
+
+		date = today()
+		currency_exchange = frappe.qb.DocType("Currency Exchange")
+		query = (
+			frappe.qb.from_(currency_exchange)
+			.select(currency_exchange.to_currency, currency_exchange.exchange_rate)
+			.where(currency_exchange.from_currency == self.filters.presentation_currency)
+			.where(currency_exchange.to_currency.isin(list(currencies)))
+			.where(currency_exchange.date <= date)
+			.orderby(currency_exchange.date, order=Order.desc)
+		)
 
-				if self.filters.presentation_currency != currency:
-					amount_tmp = convert(
-						amount_tmp,
-						self.filters.presentation_currency,
-						currency,
-						today(),
-					)
+		accounts_settings = frappe.get_cached_doc("Accounts Settings")
+		if not accounts_settings.allow_stale:
+			query = query.where(
+				currency_exchange.date > add_days(date, -cint(accounts_settings.stale_days))
+			)
 
-				amount += amount_tmp
-				amount_total += amount_tmp
+		for row in query.run(as_dict=True):
+			self.exchange_rates.setdefault(
+				(self.filters.presentation_currency, row.to_currency, date),
+				flt(row.exchange_rate),
+			)
 
-				self.expense_claims.update({period["key"]: amount})
+	def get_exchange_rate(self, from_currency, to_currency, date):
+		key = (from_currency, to_currency, date)
+		if key not in self.exchange_rates:
+			self.exchange_rates[key] = get_exchange_rate(from_currency, to_currency, date)
 
-		self.expense_claims.update({"total": amount_total})
+		return self.exchange_rates[key] or 1
 
-	def calculate_total_income(self):
-		self.total_income = {
-			"account": _("Total Income"),
-			"indent": 0.0,
-			"currency": self.filters.presentation_currency,
-			"bold": 1,
-		}
+	def convert(self, amount, currency):
+		"""Convert `amount` from `currency` to the presentation currency.
 
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.total_income.update({key: self.income.get(key, 0)})
+		Same as `erpnext.accounts.report.utils.convert`, but using the cached rates.
+		"""
+		if currency == self.filters.presentation_currency:
+			return flt(amount)
 
-	def calculate_total_expenses(self):
-		self.total_expenses = {
-			"account": _("Total Expenses"),
-			"indent": 0.0,
-			"currency": self.filters.presentation_currency,
-			"bold": 1,
-		}
+		self.conversions += 1
 
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.total_expenses.update({key: self.expenses.get(key, 0)})
+		return flt(amount) / self.get_exchange_rate(
+			self.filters.presentation_currency, currency, today()
+		)
 
-	def calculate_net_cash_flow(self):
-		self.net_cash_flow = {
-			"account": _("Net Cash Flow"),
-			"indent": 0.0,
-			"currency": self.filters.presentation_currency,
-			"warn_if_negative": 1,
-			"bold": 1,
-		}
+	def convert_values(self, values, currency):
+		"""Convert the array `values` from `currency` to the presentation currency."""
+		if currency == self.filters.presentation_currency:
+			return values
 
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			self.net_cash_flow.update({key: (self.income.get(key, 0) - self.expenses.get(key, 0))})
+		self.conversions += 1
 
-	def calculate_totals(self):
-		pass
+		return values / self.get_exchange_rate(
+			self.filters.presentation_currency, currency, today()
+		)
 
 	def get_message(self):
-		return None
+		if not self.debug:
+			return None
+
+		header = "".join(
+			f"<th>{label}</th>"
+			for label in (
+				_("Stage"),
+				_("Time (s)"),
+				_("Queries"),
+				_("Query Time (s)"),
+				_("Rows Fetched"),
+				_("Conversions"),
+			)
+		)
+		rows = "".join(
+			f"<tr><td>{stage}</td><td>{stats['time']:.3f}</td><td>{stats['queries']}</td>"
+			f"<td>{stats['query_time']:.3f}</td><td>{stats['rows']}</td>"
+			f"<td>{stats['conversions']}</td></tr>"
+			for stage, stats in self.stages.items()
+		)
+
+		return f"<table class='table table-bordered'><tr>{header}</tr>{rows}</table>"
 
 	def get_chart_data(self):
 		labels = [period["label"] for period in self.time_periods]
@@ -685,10 +1186,12 @@ class CashFlowForecast:
 		expense_values = []
 		net_cash_flow_values = []
 
-		for key in [period["key"] for period in self.time_periods] + ["total"]:
-			income_values.append(f"{self.total_income.get(key, 0):.2f}")
-			expense_values.append(f"{self.total_expenses.get(key, 0):.2f}")
-			net_cash_flow_values.append(f"{self.net_cash_flow.get(key, 0):.2f}")
+		for values, row in (
+			(income_values, self.total_income),
+			(expense_values, self.total_expenses),
+			(net_cash_flow_values, self.net_cash_flow),
+		):
+			values.extend(f"{value:.2f}" for value in [*row["values"].tolist(), row["total"]])
 
 		return {
 			"type": "bar",
@@ -705,26 +1208,159 @@ class CashFlowForecast:
 	def get_report_summary(self):
 		return [
 			{
-				"value": self.total_income.get("total", 0),
+				"value": self.total_income["total"],
 				"label": _("Income"),
 				"datatype": "Currency",
 				"currency": self.filters.presentation_currency,
 			},
 			{
-				"value": self.total_expenses.get("total", 0),
+				"value": self.total_expenses["total"],
 				"label": _("Expenses"),
 				"datatype": "Currency",
 				"currency": self.filters.presentation_currency,
 			},
 			{
-				"value": self.net_cash_flow.get("total", 0),
+				"value": self.net_cash_flow["total"],
 				"label": _("Net Cash Flow"),
-				"indicator": "Red" if self.net_cash_flow.get("total", 0) < 0 else "Green",
+				"indicator": "Red" if self.net_cash_flow["total"] < 0 else "Green",
+				"datatype": "Currency",
+				"currency": self.filters.presentation_currency,
+			},
+			{
+				"value": self.closing_balance["total"],
+				"label": _("Closing Balance"),
+				"indicator": "Red" if self.closing_balance["total"] < 0 else "Green",
 				"datatype": "Currency",
 				"currency": self.filters.presentation_currency,
 			},
 		]
 
 
+def get_weekly_period_list(filters):
+	"""Return weekly periods like `get_period_list`, covering the same date range."""
+	year_periods = get_period_list(
+		filters.from_fiscal_year,
+		filters.to_fiscal_year,
+		filters.period_start_date,
+		filters.period_end_date,
+		filters.filter_based_on,
+		"Yearly",
+		company=filters.company,
+	)
+	year_start_date = year_periods[0]["from_date"]
+	year_end_date = year_periods[-1]["to_date"]
+
+	periods = []
+	from_date = year_start_date
+	while from_date <= year_end_date:
+		to_date = min(add_days(from_date, 6), year_end_date)
+		periods.append(
+			frappe._dict(
+				key=f"week_{from_date:%Y_%m_%d}",
+				label=formatdate(from_date),
+				from_date=from_date,
+				to_date=to_date,
+				year_start_date=year_start_date,
+				year_end_date=year_end_date,
+			)
+		)
+		from_date = add_days(to_date, 1)
+
+	return periods
+
+
+def check_permission():
+	"""Throw unless the user may open the Cash Flow Forecast."""
+	if not frappe.get_cached_doc("Report", "Cash Flow Forecast").is_permitted():
+		frappe.throw(_("Not permitted"), frappe.PermissionError)
+
+
 def execute(filters=None):
+	if not (filters.get("recompute_live") or filters.get("debug")):
+		result = CashFlowForecast(frappe._dict(filters)).get_snapshot_result()
+		if result:
+			return result
+
+	# Debug runs bypass the result cache the background job is polled by, and
+	# the profiling information belongs to the request that asked for it
+	debug = filters.get("debug") or frappe.conf.get("cash_flow_forecast_debug")
+	if filters.get("run_in_background") and not debug:
+		return enqueue(filters)
+
 	return CashFlowForecast(filters).run()
+
+
+def enqueue(filters):
+	"""Compute the forecast in a background job and return a placeholder until it is cached."""
+	forecast = CashFlowForecast(frappe._dict(filters))
+	cache_key = forecast.get_cache_key()
+
+	result = frappe.cache().hget(CACHE_KEY, cache_key)
+	if result is not None:
+		return result
+
+	# Only one job per cache key is queued or running at a time
+	frappe.enqueue(
+		run_in_background,
+		queue="long",
+		timeout=3600,
+		job_id=f"cash_flow_forecast:{hashlib.sha1(cache_key.encode()).hexdigest()}",
+		deduplicate=True,
+		filters=filters,
+		cache_key=cache_key,
+		data_version=get_data_version(),
+		lang=frappe.local.lang,
+	)
+
+	return (
+		forecast.get_columns(),
+		[],
+		_(
+			"The forecast is being computed in the background. The report will refresh when it is ready."
+		),
+	)
+
+
+def run_in_background(filters, cache_key, data_version=None, lang=None):
+	"""Compute the forecast and store it under `cache_key`, which `enqueue` polls.
+
+	The result is dropped if the source data changed since `data_version` was
+	read, so that `clear_cache` can't be undone by a job that was already running.
+	"""
+	# Labels are translated, and the cache key computed, in the language of the user
+	if lang:
+		frappe.local.lang = lang
+
+	forecast = CashFlowForecast(frappe._dict(filters))
+	forecast.in_background = True
+	result = forecast.get_result()
+
+	if get_data_version() == data_version:
+		frappe.cache().hset(CACHE_KEY, cache_key, result)
+
+	frappe.publish_realtime(
+		"cash_flow_forecast_ready", {"cache_key": cache_key}, user=frappe.session.user
+	)
+
+
+def get_series_key():
+	"""Return the key of the hash of the daily series cached today.
+
+	Scheduled orders and overdue invoices depend on the current date.
+	"""
+	return f"{SERIES_KEY}:{today()}"
+
+
+def get_data_version():
+	"""Return a random token that changes whenever the source data changes."""
+	version = frappe.cache().get_value(DATA_VERSION_KEY)
+	if not version:
+		version = frappe.generate_hash(length=12)
+		frappe.cache().set_value(DATA_VERSION_KEY, version)
+
+	return version
+
+
+def clear_cache(doc=None, method=None):
+	"""Drop all cached results. Called from `doc_events` when source data changes."""
+	frappe.cache().delete_value([CACHE_KEY, get_series_key(), DATA_VERSION_KEY])
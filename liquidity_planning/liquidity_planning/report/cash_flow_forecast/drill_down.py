@@ -0,0 +1,150 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+"""Drill-down into the figures of the Cash Flow Forecast.
+
+The report itself only returns the sections and their companies. When a
+figure of a section with a party is expanded, its parties are loaded page by
+page, largest first, and when a party is expanded, its documents.
+"""
+
+import frappe
+from frappe import _
+from frappe.query_builder import Order
+from frappe.query_builder.functions import Abs, Count, Sum
+from frappe.utils import cint, today
+
+from liquidity_planning.liquidity_planning.doctype.payment_delay.payment_delay import PARTY_FIELDS
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	PARTY_SECTIONS,
+	CashFlowForecast,
+	check_permission,
+)
+from liquidity_planning.queries import get_open_orders, get_outstanding_invoices
+
+PAGE_LENGTH = 20
+MAX_PAGE_LENGTH = 500
+
+
+@frappe.whitelist()
+def get_children(filters, section, period=None, party=None, start=0, page_length=PAGE_LENGTH):
+	"""Return a page of the parties of `section` in `period`, or of the documents of `party`.
+
+	`period` is the key of a time period, or "total" for all of them.
+	"""
+	check_permission()
+
+	drill_down = DrillDown(frappe._dict(frappe.parse_json(filters)), section, period)
+	start = cint(start)
+	page_length = min(cint(page_length) or PAGE_LENGTH, MAX_PAGE_LENGTH)
+
+	if party:
+		children = drill_down.get_documents(party, start, page_length + 1)
+	else:
+		children = drill_down.get_parties(start, page_length + 1)
+
+	return {
+		"children": children[:page_length],
+		"has_more": len(children) > page_length,
+		"currency": drill_down.filters.presentation_currency,
+	}
+
+
+class DrillDown:
+	def __init__(self, filters, section, period=None):
+		if section not in PARTY_SECTIONS:
+			frappe.throw(_("Unknown section: {0}").format(section))
+
+		self.forecast = CashFlowForecast(filters)
+		self.forecast.exchange_rates = {}
+		self.filters = self.forecast.filters
+		self.doctype = self.forecast.get_loaders()[section][2]
+		self.from_date, self.to_date = self.get_date_range(period)
+
+	def get_date_range(self, period):
+		time_periods = self.forecast.time_periods
+		if not period or period == "total":
+			return time_periods[0]["from_date"], time_periods[-1]["to_date"]
+
+		for time_period in time_periods:
+			if time_period["key"] == period:
+				return time_period["from_date"], time_period["to_date"]
+
+		frappe.throw(_("Unknown period: {0}").format(period))
+
+	def get_parties(self, start, page_length):
+		"""Return the parties with their amount and number of documents, largest first."""
+		documents = self.get_documents_query()
+		amount = Sum(documents.amount * self.get_conversion_factor(documents))
+
+		return (
+			frappe.qb.from_(documents)
+			.select(
+				documents.party,
+				amount.as_("amount"),
+				Count(documents.name).distinct().as_("documents"),
+			)
+			.groupby(documents.party)
+			.orderby(Abs(amount), order=Order.desc)
+			.orderby(documents.party)
+			.limit(page_length)
+			.offset(start)
+		).run(as_dict=True)
+
+	def get_documents(self, party, start, page_length):
+		"""Return the documents of `party` with their amount, also in the presentation currency."""
+		documents = self.get_documents_query()
+
+		rows = (
+			frappe.qb.from_(documents)
+			.select(
+				documents.name,
+				documents.currency.as_("document_currency"),
+				Sum(documents.amount).as_("document_amount"),
+				Sum(documents.amount * self.get_conversion_factor(documents)).as_("amount"),
+			)
+			.where(documents.party == party)
+			.groupby(documents.name, documents.currency)
+			.orderby(documents.name)
+			.limit(page_length)
+			.offset(start)
+		).run(as_dict=True)
+
+		for row in rows:
+			row.doctype = self.doctype
+
+		return rows
+
+	def get_conversion_factor(self, documents):
+		currencies = (
+			frappe.qb.from_(documents).select(documents.currency).distinct().run(pluck=True)
+		)
+		return self.forecast.get_conversion_factor(documents.currency, currencies)
+
+	def get_documents_query(self):
+		"""Return a query of the name, party, date, currency and amount of every document.
+
+		Selects from the same queries as `CashFlowForecast.get_documents_by_day`,
+		limited to the selected period.
+		"""
+		if self.doctype in PARTY_FIELDS:
+			documents = get_outstanding_invoices(
+				self.doctype,
+				self.filters.company,
+				self.filters.apply_payment_delays,
+				overdue_date=today(),
+			)
+		else:
+			documents = get_open_orders(self.doctype, self.filters.company)
+
+		return (
+			frappe.qb.from_(documents)
+			.select(
+				documents.name,
+				documents.party,
+				documents.posting_date,
+				documents.currency,
+				documents.amount,
+			)
+			.where(documents.posting_date.between(self.from_date, self.to_date))
+		)
@@ -0,0 +1,337 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+"""Document-level export of the Cash Flow Forecast.
+
+Lists every document behind the figures of the report, with its amount per
+period. The documents are read in pages, using keyset pagination on the
+name, and written to the response as they are read, so that the memory usage
+doesn't depend on the number of documents.
+"""
+
+import csv
+import tempfile
+from bisect import bisect_right
+from collections import defaultdict
+from io import StringIO
+
+import frappe
+from frappe import _
+from frappe.utils import flt, getdate, today
+from openpyxl import Workbook
+from werkzeug.wrappers import Response
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	DAYS_PER_MONTH,
+	CashFlowForecast,
+	check_permission,
+)
+from liquidity_planning.queries import (
+	get_expense_claims,
+	get_open_orders,
+	get_outstanding_invoices,
+)
+
+PAGE_LENGTH = 1000
+CHUNK_SIZE = 64 * 1024
+
+FILE_FORMATS = {
+	"CSV": ("csv", "text/csv"),
+	"Excel": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+}
+
+
+@frappe.whitelist()
+def export_documents(filters, file_format="CSV"):
+	"""Stream the documents behind the Cash Flow Forecast as CSV or Excel file."""
+	check_permission()
+
+	if file_format not in FILE_FORMATS:
+		frappe.throw(_("Unsupported file format: {0}").format(file_format))
+
+	filters = frappe.parse_json(filters)
+	site = frappe.local.site
+	sites_path = frappe.local.sites_path
+	user = frappe.session.user
+	lang = frappe.local.lang
+
+	def generate():
+		# The request context is destroyed before the response is streamed, so
+		# the export sets up its own, like the threads of `load_sections_in_parallel`.
+		frappe.init(site=site, sites_path=sites_path)
+		try:
+			frappe.connect()
+			frappe.set_user(user)
+			frappe.local.lang = lang
+			export = DocumentExport(frappe._dict(filters))
+			if file_format == "Excel":
+				yield from export.get_xlsx()
+			else:
+				yield from export.get_csv()
+		finally:
+			frappe.destroy()
+
+	extension, mimetype = FILE_FORMATS[file_format]
+	filename = f"cash_flow_forecast_documents.{extension}"
+	return Response(
+		generate(),
+		mimetype=mimetype,
+		headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+	)
+
+
+class DocumentExport:
+	def __init__(self, filters):
+		self.forecast = CashFlowForecast(filters)
+		self.forecast.exchange_rates = {}
+		self.filters = self.forecast.filters
+		self.time_periods = self.forecast.time_periods
+		self.from_dates = [period["from_date"] for period in self.time_periods]
+
+	def get_header(self):
+		return [
+			_("Section"),
+			_("Document Type"),
+			_("Document"),
+			_("Period"),
+			_("Amount"),
+			_("Currency"),
+			_("Amount ({0})").format(self.filters.presentation_currency),
+		]
+
+	def get_csv(self):
+		"""Yield the export as CSV, one page of rows at a time."""
+		buffer = StringIO()
+		writer = csv.writer(buffer)
+		writer.writerow(self.get_header())
+
+		for i, row in enumerate(self.get_rows(), 1):
+			writer.writerow(row)
+			if i % PAGE_LENGTH == 0:
+				yield buffer.getvalue()
+				buffer.seek(0)
+				buffer.truncate()
+
+		yield buffer.getvalue()
+
+	def get_xlsx(self):
+		"""Yield the export as Excel file.
+
+		The write-only workbook keeps only the current row in memory. As XLSX is
+		a zip archive, it can only be streamed after it has been written to a
+		temporary file.
+		"""
+		workbook = Workbook(write_only=True)
+		sheet = workbook.create_sheet(_("Documents"))
+		sheet.append(self.get_header())
+		for row in self.get_rows():
+			sheet.append(row)
+
+		with tempfile.TemporaryFile() as f:
+			workbook.save(f)
+			f.seek(0)
+			while chunk := f.read(CHUNK_SIZE):
+				yield chunk
+
+	def get_rows(self):
+		"""Yield the section, document, period, amount and converted amount of every document."""
+		for section, doctype, name, date, amount, currency in self.get_documents():
+			period_key = self.get_period_key(date)
+			if not period_key or not amount:
+				continue
+
+			yield [
+				section,
+				doctype,
+				name,
+				period_key,
+				flt(amount),
+				currency,
+				self.forecast.convert(amount, currency),
+			]
+
+	def get_documents(self):
+		yield from self.get_orders("Sales Order", _("Sales Orders (Open)"))
+		yield from self.get_scheduled_orders("Sales Order", _("Sales Orders (Scheduled)"))
+		yield from self.get_invoices("Sales Invoice", _("Sales Invoices"))
+		yield from self.get_orders("Purchase Order", _("Purchase Orders (Open)"))
+		yield from self.get_scheduled_orders("Purchase Order", _("Purchase Orders (Scheduled)"))
+		yield from self.get_invoices("Purchase Invoice", _("Purchase Invoices"))
+		yield from self.get_salaries(_("Salaries"))
+		yield from self.get_expense_claims(_("Expense Claims"))
+
+	def get_period_key(self, date):
+		"""Return the key of the period containing `date`, or None if it is out of range."""
+		date = getdate(date)
+		i = bisect_right(self.from_dates, date) - 1
+		if i < 0 or date > self.time_periods[i]["to_date"]:
+			return None
+
+		return self.time_periods[i]["key"]
+
+	def get_pages(self, query, table):
+		"""Yield the rows of `query` in pages, each after the last name of the previous one."""
+		last_name = None
+		while True:
+			page = query.orderby(table.name).limit(PAGE_LENGTH)
+			if last_name is not None:
+				page = page.where(table.name > last_name)
+
+			rows = page.run(as_dict=True)
+			if rows:
+				yield rows
+
+			if len(rows) < PAGE_LENGTH:
+				return
+
+			last_name = rows[-1].name
+
+	def get_orders(self, doctype, label):
+		"""Yield the unbilled amounts of the open orders of `doctype`."""
+		yield from self.get_query_documents(
+			get_open_orders(doctype, self.filters.company), doctype, label
+		)
+
+	def get_scheduled_orders(self, doctype, label):
+		"""Yield the amounts of the orders of `doctype` on every date scheduled by Auto Repeat."""
+		auto_repeat = frappe.qb.DocType("Auto Repeat")
+		query = (
+			frappe.qb.from_(auto_repeat)
+			.select(
+				auto_repeat.name,
+				auto_repeat.reference_doctype,
+				auto_repeat.reference_document,
+				auto_repeat.start_date,
+				auto_repeat.end_date,
+				auto_repeat.frequency,
+				auto_repeat.repeat_on_day,
+				auto_repeat.repeat_on_last_day,
+				auto_repeat.next_schedule_date,
+			)
+			.where(auto_repeat.status == "Active")
+			.where(auto_repeat.reference_doctype == doctype)
+		)
+
+		for auto_repeats in self.get_pages(query, auto_repeat):
+			filters = {"name": ["in", [row.reference_document for row in auto_repeats]]}
+			if self.filters.company:
+				filters["company"] = self.filters.company
+
+			orders = {
+				order.name: order
+				for order in frappe.get_all(
+					doctype, filters=filters, fields=["name", "grand_total", "currency"]
+				)
+			}
+
+			repeat_on_days = defaultdict(list)
+			for repeat_on_day in frappe.get_all(
+				"Auto Repeat Day",
+				filters={
+					"parenttype": "Auto Repeat",
+					"parent": ["in", [row.name for row in auto_repeats]],
+				},
+				fields=["parent", "day"],
+				order_by="idx",
+			):
+				repeat_on_days[repeat_on_day.parent].append({"day": repeat_on_day.day})
+
+			for row in auto_repeats:
+				order = orders.get(row.reference_document)
+				if not order:
+					# The order belongs to another company
+					continue
+
+				auto_repeat_doc = frappe.get_doc(
+					dict(row, doctype="Auto Repeat", repeat_on_days=repeat_on_days[row.name])
+				)
+				for schedule_detail in auto_repeat_doc.get_auto_repeat_schedule():
+					yield (
+						label,
+						doctype,
+						order.name,
+						schedule_detail["next_scheduled_date"],
+						order.grand_total,
+						order.currency,
+					)
+
+	def get_invoices(self, doctype, label):
+		"""Yield the outstanding amounts of the invoices of `doctype`, per payment term."""
+		documents = get_outstanding_invoices(
+			doctype,
+			self.filters.company,
+			self.filters.apply_payment_delays,
+			overdue_date=today(),
+		)
+		yield from self.get_query_documents(documents, doctype, label)
+
+	def get_query_documents(self, documents, doctype, label):
+		"""Yield the rows of the derived table `documents` within the forecast, page by page.
+
+		Pages are formed by document name, so that a page never splits the
+		payment terms of an invoice.
+		"""
+		in_range = documents.posting_date.between(
+			self.forecast.start_date, self.forecast.end_date
+		)
+		names = frappe.qb.from_(documents).select(documents.name).distinct().where(in_range)
+
+		for page in self.get_pages(names, documents):
+			rows = (
+				frappe.qb.from_(documents)
+				.select(
+					documents.name,
+					documents.posting_date,
+					documents.amount,
+					documents.currency,
+				)
+				.where(documents.name.isin([row.name for row in page]))
+				.where(in_range)
+				.orderby(documents.name)
+				.orderby(documents.posting_date)
+			).run(as_dict=True)
+
+			for row in rows:
+				yield label, doctype, row.name, row.posting_date, row.amount, row.currency
+
+	def get_salaries(self, label):
+		"""Yield the salary of every employee per period, like `get_salaries_by_day`."""
+		employee = frappe.qb.DocType("Employee")
+		query = (
+			frappe.qb.from_(employee)
+			.select(
+				employee.name,
+				employee.ctc,
+				employee.salary_currency,
+				employee.date_of_joining,
+				employee.relieving_date,
+			)
+			.where(employee.ctc != "")
+		)
+
+		if self.filters.company:
+			query = query.where(employee.company == self.filters.company)
+
+		for employees in self.get_pages(query, employee):
+			for row in employees:
+				daily_salary = flt(row.ctc) / DAYS_PER_MONTH
+				relieving_date = row.relieving_date or self.forecast.end_date
+
+				for period in self.time_periods:
+					first_day = max(getdate(row.date_of_joining), period["from_date"])
+					last_day = min(getdate(relieving_date), period["to_date"])
+					days = (last_day - first_day).days + 1
+					if days > 0:
+						yield (
+							label,
+							"Employee",
+							row.name,
+							period["from_date"],
+							days * daily_salary,
+							row.salary_currency,
+						)
+
+	def get_expense_claims(self, label):
+		yield from self.get_query_documents(
+			get_expense_claims(self.filters.company), "Expense Claim", label
+		)
@@ -0,0 +1,213 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+"""What-if scenarios for the Cash Flow Forecast.
+
+The daily series of the baseline forecast are loaded once. Every scenario
+applies its adjustments to a copy of them in memory and is summed up into
+the report rows, so additional scenarios don't query the database again.
+
+A scenario is a dict with a `name` and a list of `adjustments`, each with a
+`type` and its parameters:
+
+- `shift`: move the amounts by `days` (positive is later)
+- `scale`: multiply the amounts by `factor`
+- `exclude`: remove the amounts, or only those of the Auto Repeat `auto_repeat`
+- `entry`: add a one-off `amount` in `currency` on `date`
+
+`shift`, `scale` and `exclude` apply to one `section` (e.g. "purchase_orders",
+see `CashFlowForecast.get_loaders`) or to all sections, and optionally only to
+one `company`. An `entry` is added to `section`.
+"""
+
+import frappe
+import numpy as np
+from frappe import _
+from frappe.utils import cint, flt, getdate
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	CashFlowForecast,
+	check_permission,
+)
+
+# Sections with an Auto Repeat schedule, per reference doctype
+SCHEDULED_SECTIONS = {
+	"Sales Order": "sales_orders_scheduled",
+	"Purchase Order": "purchase_orders_scheduled",
+}
+
+
+@frappe.whitelist()
+def get_scenarios(filters, scenarios):
+	"""Return the columns and, per scenario, the rows and summary of the Cash Flow Forecast."""
+	check_permission()
+
+	filters = frappe._dict(frappe.parse_json(filters))
+	scenarios = frappe.parse_json(scenarios)
+
+	forecast = ScenarioForecast(filters, scenarios)
+	return {
+		"columns": forecast.get_columns(),
+		"scenarios": forecast.get_scenarios(),
+	}
+
+
+class ScenarioForecast(CashFlowForecast):
+	def __init__(self, filters, scenarios):
+		super().__init__(filters)
+		self.scenarios = scenarios
+		# Adjustments apply to the series of whole sections, not to single parties
+		self.filters.group_by_party = 0
+
+		sections = self.get_loaders().keys()
+		for scenario in scenarios:
+			for adjustment in scenario.get("adjustments", []):
+				validate_adjustment(adjustment, sections)
+
+		# Load the amounts that can be shifted into the time periods as well
+		self.widen_range(
+			max(
+				[
+					abs(cint(adjustment.get("days")))
+					for scenario in scenarios
+					for adjustment in scenario.get("adjustments", [])
+					if adjustment["type"] == "shift"
+				],
+				default=0,
+			)
+		)
+
+	def get_scenarios(self):
+		self.load_data()
+		baseline = self.series
+		self.excluded_auto_repeats = {}
+
+		results = []
+		for scenario in self.scenarios:
+			self.series = self.get_adjusted_series(baseline, scenario.get("adjustments", []))
+			self.data = {
+				section: self.get_amounts_by_period(series)
+				for section, series in self.series.items()
+			}
+			data = self.get_rows()
+			results.append(
+				{
+					"name": scenario.get("name"),
+					"data": data,
+					"report_summary": self.get_report_summary(),
+				}
+			)
+
+		return results
+
+	def get_adjusted_series(self, baseline, adjustments):
+		"""Return a copy of the `baseline` series with `adjustments` applied in order."""
+		series = {
+			section: {
+				key: {fieldname: array.copy() for fieldname, array in arrays.items()}
+				for key, arrays in section_series.items()
+			}
+			for section, section_series in baseline.items()
+		}
+
+		for adjustment in adjustments:
+			if adjustment["type"] == "entry":
+				self.add_entry(series, adjustment)
+			elif adjustment["type"] == "exclude" and adjustment.get("auto_repeat"):
+				self.exclude_auto_repeat(series, adjustment["auto_repeat"])
+			else:
+				for arrays in self.get_matching_arrays(series, adjustment):
+					for fieldname, array in arrays.items():
+						arrays[fieldname] = adjust(array, adjustment)
+
+		return series
+
+	def get_matching_arrays(self, series, adjustment):
+		"""Yield the arrays of the section and company targeted by `adjustment`."""
+		for section, section_series in series.items():
+			if adjustment.get("section") and adjustment["section"] != section:
+				continue
+
+			for (company, currency), arrays in section_series.items():
+				if adjustment.get("company") and adjustment["company"] != company:
+					continue
+
+				yield arrays
+
+	def add_entry(self, series, adjustment):
+		offset = (getdate(adjustment["date"]) - self.start_date).days
+		if not 0 <= offset < self.days:
+			return
+
+		section_series = series.setdefault(adjustment["section"], {})
+		key = (
+			adjustment.get("company")
+			or self.filters.company
+			or frappe.defaults.get_user_default("Company"),
+			adjustment.get("currency") or self.filters.presentation_currency,
+		)
+		if key not in section_series:
+			section_series[key] = {"amount": np.zeros(self.days)}
+
+		section_series[key]["amount"][offset] += flt(adjustment["amount"])
+
+	def exclude_auto_repeat(self, series, auto_repeat):
+		"""Subtract the schedule of `auto_repeat` from the scheduled orders."""
+		if auto_repeat not in self.excluded_auto_repeats:
+			doctype = frappe.db.get_value("Auto Repeat", auto_repeat, "reference_doctype")
+			if doctype not in SCHEDULED_SECTIONS:
+				frappe.throw(_("Auto Repeat {0} does not schedule orders").format(auto_repeat))
+
+			self.excluded_auto_repeats[auto_repeat] = (
+				SCHEDULED_SECTIONS[doctype],
+				self.get_scheduled_orders_by_day(doctype, [auto_repeat]),
+			)
+
+		section, excluded_series = self.excluded_auto_repeats[auto_repeat]
+		for key, excluded_arrays in excluded_series.items():
+			arrays = series.get(section, {}).get(key)
+			if arrays:
+				arrays["amount"] = arrays["amount"] - excluded_arrays["amount"]
+
+
+def validate_adjustment(adjustment, sections):
+	required_fields = {
+		"shift": ["days"],
+		"scale": ["factor"],
+		"exclude": [],
+		"entry": ["section", "date", "amount"],
+	}
+
+	if adjustment.get("type") not in required_fields:
+		frappe.throw(_("Unknown adjustment type: {0}").format(adjustment.get("type")))
+
+	for fieldname in required_fields[adjustment["type"]]:
+		if adjustment.get(fieldname) in (None, ""):
+			frappe.throw(
+				_("Adjustments of type {0} need a value for {1}").format(
+					adjustment["type"], fieldname
+				)
+			)
+
+	if adjustment.get("section") and adjustment["section"] not in sections:
+		frappe.throw(_("Unknown section: {0}").format(adjustment["section"]))
+
+
+def adjust(array, adjustment):
+	"""Return `array` shifted, scaled or excluded as specified by `adjustment`."""
+	if adjustment["type"] == "scale":
+		return array * flt(adjustment["factor"])
+
+	if adjustment["type"] == "exclude":
+		return np.zeros_like(array)
+
+	days = cint(adjustment["days"])
+	shifted = np.zeros_like(array)
+	if days > 0:
+		shifted[days:] = array[:-days]
+	elif days < 0:
+		shifted[:days] = array[-days:]
+	else:
+		shifted[:] = array
+
+	return shifted
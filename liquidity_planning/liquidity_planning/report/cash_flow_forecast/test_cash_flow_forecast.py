@@ -0,0 +1,181 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+from unittest.mock import patch
+
+import frappe
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+from frappe.utils import add_days, getdate
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.cash_flow_forecast import (
+	DAYS_PER_MONTH,
+	CashFlowForecast,
+	get_series_key,
+)
+
+
+def get_forecast(from_date, to_date, periodicity="Monthly"):
+	return CashFlowForecast(
+		frappe._dict(
+			company=None,
+			filter_based_on="Date Range",
+			period_start_date=getdate(from_date),
+			period_end_date=getdate(to_date),
+			periodicity=periodicity,
+			presentation_currency="EUR",
+		)
+	)
+
+
+def get_random_series(forecast, seed=0):
+	rng = np.random.default_rng(seed)
+	return {
+		"sales_invoices": {
+			("Test Company", "EUR"): {"amount": rng.uniform(-1000, 1000, forecast.days)},
+			("Test Company", "USD"): {"amount": rng.uniform(0, 1000, forecast.days)},
+		}
+	}
+
+
+def sum_by_period(forecast, array):
+	"""Sum up the daily `array` per period, day by day."""
+	sums = []
+	for period in forecast.time_periods:
+		first_day = (period["from_date"] - forecast.start_date).days
+		last_day = (period["to_date"] - forecast.start_date).days
+		sums.append(sum(array[day] for day in range(first_day, last_day + 1)))
+
+	return sums
+
+
+class TestCashFlowForecast(FrappeTestCase):
+	def setUp(self):
+		frappe.cache().delete_value(get_series_key())
+
+	def tearDown(self):
+		frappe.cache().delete_value(get_series_key())
+
+	def test_amounts_by_period(self):
+		for periodicity in ("Weekly", "Monthly", "Quarterly"):
+			forecast = get_forecast("2026-01-01", "2026-12-31", periodicity)
+			series = get_random_series(forecast)["sales_invoices"]
+
+			amounts = forecast.get_amounts_by_period(series)
+
+			for key, arrays in series.items():
+				np.testing.assert_allclose(
+					amounts[key]["amount"], sum_by_period(forecast, arrays["amount"])
+				)
+
+	def test_amounts_by_period_of_widened_range(self):
+		forecast = get_forecast("2026-01-01", "2026-06-30")
+		days = forecast.days
+		forecast.widen_range(30)
+		array = np.zeros(forecast.days)
+		array[:30] = 1
+		array[30 : 30 + days] = 2
+		array[30 + days :] = 4
+
+		amounts = forecast.get_amounts_by_period({("Test Company", "EUR"): {"amount": array}})
+
+		self.assertEqual(amounts[("Test Company", "EUR")]["amount"].sum(), 2 * days)
+
+	def test_salaries(self):
+		"""Salaries equal `ctc` per average month for every day employed in a period."""
+		forecast = get_forecast("2026-01-01", "2026-12-31")
+		employees = [
+			frappe._dict(
+				name="EMP-1",
+				company="Test Company",
+				ctc=3000,
+				salary_currency="EUR",
+				date_of_joining=getdate("2020-01-01"),
+				relieving_date=None,
+			),
+			frappe._dict(
+				name="EMP-2",
+				company="Test Company",
+				ctc=4500,
+				salary_currency="EUR",
+				date_of_joining=getdate("2026-02-15"),
+				relieving_date=getdate("2026-08-10"),
+			),
+			frappe._dict(
+				name="EMP-3",
+				company="Test Company",
+				ctc=2000,
+				salary_currency="USD",
+				date_of_joining=getdate("2025-03-01"),
+				relieving_date=getdate("2025-12-31"),
+			),
+		]
+
+		with patch("frappe.get_all", return_value=employees):
+			series = forecast.get_salaries_by_day()
+
+		amounts = forecast.get_amounts_by_period(series)
+
+		for currency in ("EUR", "USD"):
+			expected = []
+			for period in forecast.time_periods:
+				salary = 0
+				for employee in employees:
+					if employee.salary_currency != currency:
+						continue
+
+					first_day = max(employee.date_of_joining, period["from_date"])
+					last_day = min(employee.relieving_date or forecast.end_date, period["to_date"])
+					days = (last_day - first_day).days
+					if days >= 0:
+						salary += (days + 1) / DAYS_PER_MONTH * employee.ctc
+				expected.append(salary)
+
+			actual = amounts.get(("Test Company", currency), {}).get(
+				"amount", np.zeros(len(forecast.time_periods))
+			)
+			np.testing.assert_allclose(actual, expected)
+
+	def test_weekly_periods(self):
+		forecast = get_forecast("2026-01-01", "2026-12-31", "Weekly")
+		time_periods = forecast.time_periods
+
+		self.assertEqual(time_periods[0]["from_date"], getdate("2026-01-01"))
+		self.assertEqual(time_periods[-1]["to_date"], getdate("2026-12-31"))
+		self.assertEqual(len({period["key"] for period in time_periods}), len(time_periods))
+
+		for period, next_period in zip(time_periods, time_periods[1:]):
+			self.assertEqual((period["to_date"] - period["from_date"]).days, 6)
+			self.assertEqual(next_period["from_date"], add_days(period["to_date"], 1))
+
+		self.assertLessEqual((time_periods[-1]["to_date"] - time_periods[-1]["from_date"]).days, 6)
+
+	def test_cached_series(self):
+		"""A cached wider series, sliced to a narrower range, gives the same period totals."""
+		wide = get_forecast("2026-01-01", "2026-12-31")
+		wide_series = get_random_series(wide)
+		frappe.cache().hset(
+			get_series_key(), wide.get_series_cache_key(wide.start_date, wide.end_date), wide_series
+		)
+
+		narrow = get_forecast("2026-03-01", "2026-05-31")
+		narrow_series = narrow.get_cached_series()
+
+		self.assertIsNotNone(narrow_series)
+		wide_amounts = wide.get_amounts_by_period(wide_series["sales_invoices"])
+		narrow_amounts = narrow.get_amounts_by_period(narrow_series["sales_invoices"])
+		for key in wide_series["sales_invoices"]:
+			self.assertEqual(len(narrow_series["sales_invoices"][key]["amount"]), narrow.days)
+			np.testing.assert_allclose(
+				narrow_amounts[key]["amount"], wide_amounts[key]["amount"][2:5]
+			)
+
+	def test_cached_series_not_covering_range(self):
+		cached = get_forecast("2026-03-01", "2026-05-31")
+		frappe.cache().hset(
+			get_series_key(),
+			cached.get_series_cache_key(cached.start_date, cached.end_date),
+			get_random_series(cached),
+		)
+
+		self.assertIsNone(get_forecast("2026-01-01", "2026-12-31").get_cached_series())
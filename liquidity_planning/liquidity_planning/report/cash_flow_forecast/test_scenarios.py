@@ -0,0 +1,55 @@
+# Copyright (c) 2026, ALYF GmbH and contributors
+# For license information, please see license.txt
+
+import frappe
+import numpy as np
+from frappe.tests.utils import FrappeTestCase
+
+from liquidity_planning.liquidity_planning.report.cash_flow_forecast.scenarios import (
+	adjust,
+	validate_adjustment,
+)
+
+
+class TestScenarios(FrappeTestCase):
+	def setUp(self):
+		self.array = np.arange(1.0, 6.0)
+
+	def test_shift_later(self):
+		shifted = adjust(self.array, {"type": "shift", "days": 2})
+		np.testing.assert_array_equal(shifted, [0, 0, 1, 2, 3])
+
+	def test_shift_earlier(self):
+		shifted = adjust(self.array, {"type": "shift", "days": -2})
+		np.testing.assert_array_equal(shifted, [3, 4, 5, 0, 0])
+
+	def test_shift_by_zero_days(self):
+		shifted = adjust(self.array, {"type": "shift", "days": 0})
+		np.testing.assert_array_equal(shifted, self.array)
+		self.assertIsNot(shifted, self.array)
+
+	def test_scale(self):
+		scaled = adjust(self.array, {"type": "scale", "factor": 0.5})
+		np.testing.assert_array_equal(scaled, self.array / 2)
+
+	def test_exclude(self):
+		excluded = adjust(self.array, {"type": "exclude"})
+		np.testing.assert_array_equal(excluded, np.zeros(5))
+
+	def test_adjust_does_not_change_the_baseline(self):
+		adjust(self.array, {"type": "shift", "days": 1})
+		adjust(self.array, {"type": "scale", "factor": 2})
+		np.testing.assert_array_equal(self.array, [1, 2, 3, 4, 5])
+
+	def test_validate_adjustment(self):
+		sections = ("sales_orders", "purchase_orders")
+		validate_adjustment({"type": "shift", "days": 7, "section": "sales_orders"}, sections)
+		validate_adjustment({"type": "exclude"}, sections)
+
+		for adjustment in (
+			{"type": "discount"},
+			{"type": "scale"},
+			{"type": "entry", "section": "sales_orders", "date": "2026-01-01"},
+			{"type": "shift", "days": 7, "section": "salaries_and_wages"},
+		):
+			self.assertRaises(frappe.ValidationError, validate_adjustment, adjustment, sections)
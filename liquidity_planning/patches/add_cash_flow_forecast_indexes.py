@@ -0,0 +1,5 @@
+from liquidity_planning.indexes import add_indexes
+
+
+def execute():
+	add_indexes()
@@ -0,0 +1,9 @@
+from liquidity_planning.liquidity_planning.doctype.cash_flow_bucket.cash_flow_bucket import (
+	buckets_enabled,
+	rebuild_buckets,
+)
+
+
+def execute():
+	if buckets_enabled():
+		rebuild_buckets()
@@ -0,0 +1,7 @@
+from liquidity_planning.liquidity_planning.doctype.payment_delay.payment_delay import (
+	update_payment_delays,
+)
+
+
+def execute():
+	update_payment_delays()
@@ -0,0 +1,182 @@
+"""Queries of the orders, invoices and expense claims behind the Cash Flow Forecast.
+
+Shared by the report, its drill-down and export, and the Cash Flow Buckets, so
+that all of them project the same amounts. Each function returns a query with
+one row per document or payment term and the columns `name`, `company`,
+`party`, `posting_date`, `currency` and `amount`, to be used as a derived
+table: `frappe.qb.from_(documents).select(documents.amount)`.
+"""
+
+import frappe
+from frappe.query_builder import Case, CustomFunction
+from frappe.query_builder.functions import Coalesce, Date
+from pypika import analytics as an
+
+from liquidity_planning.liquidity_planning.doctype.payment_delay.payment_delay import PARTY_FIELDS
+
+# Date on which the amounts of each source doctype are expected. Invoices are
+# due on the dates of their payment schedule, falling back to this field.
+DATE_FIELDS = {
+	"Sales Order": "delivery_date",
+	"Purchase Order": "schedule_date",
+	"Sales Invoice": "due_date",
+	"Purchase Invoice": "due_date",
+	"Expense Claim": "posting_date",
+}
+
+ORDER_PARTY_FIELDS = {
+	"Sales Order": "customer",
+	"Purchase Order": "supplier",
+}
+
+AddDate = CustomFunction("ADDDATE", ["date", "days"])
+Greatest = CustomFunction("GREATEST", ["a", "b"])
+Least = CustomFunction("LEAST", ["a", "b"])
+
+
+def get_open_orders(doctype, company=None):
+	"""Return a query of the unbilled amounts of the open orders of `doctype`.
+
+	Orders are expected to be paid on their delivery date (Sales Order) or
+	required by date (Purchase Order).
+	"""
+	order = frappe.qb.DocType(doctype)
+
+	query = (
+		frappe.qb.from_(order)
+		.select(
+			order.name,
+			order.company,
+			order[ORDER_PARTY_FIELDS[doctype]].as_("party"),
+			order[DATE_FIELDS[doctype]].as_("posting_date"),
+			order.currency,
+			(order.grand_total * (100 - order.per_billed) / 100).as_("amount"),
+		)
+		.where(order.docstatus == 1)
+		.where(order.per_billed < 100)
+		.where(order.status.notin(["Closed", "Completed"]))
+	)
+
+	if company:
+		query = query.where(order.company == company)
+
+	return query
+
+
+def get_outstanding_invoices(doctype, company=None, apply_payment_delays=False, overdue_date=None):
+	"""Return a query of the outstanding amounts of the invoices of `doctype`, per payment term.
+
+	Where payments have been allocated to payment terms, each term keeps its
+	own outstanding amount. Otherwise, payments are assumed to settle the
+	earliest terms first, so that the outstanding amount fills up the latest
+	terms. Invoices without a payment schedule are due in full on their due
+	date. With `apply_payment_delays`, every due date is moved by the usual
+	delay of the party. Amounts due before `overdue_date` are expected on it
+	instead. Amounts are in the currency of the party account, which the
+	outstanding amount is kept in.
+	"""
+	party_type, party_field = PARTY_FIELDS[doctype]
+	invoice = frappe.qb.DocType(doctype)
+	payment_schedule = frappe.qb.DocType("Payment Schedule")
+	payment_delay = frappe.qb.DocType("Payment Delay")
+	due_date = Coalesce(payment_schedule.due_date, invoice.due_date)
+	portion = Coalesce(payment_schedule.invoice_portion, 100)
+	currency = Coalesce(invoice.party_account_currency, invoice.currency)
+	term_order = (due_date, payment_schedule.idx)
+
+	terms = (
+		frappe.qb.from_(invoice)
+		.left_join(payment_schedule)
+		.on((payment_schedule.parent == invoice.name) & (payment_schedule.parenttype == doctype))
+		.select(
+			invoice.name,
+			invoice.company,
+			invoice[party_field].as_("party"),
+			currency.as_("currency"),
+			invoice.outstanding_amount,
+			# Grand total in the currency of the outstanding amount
+			Case()
+			.when(currency == invoice.currency, invoice.grand_total)
+			.else_(invoice.base_grand_total)
+			.as_("grand_total"),
+			portion.as_("portion"),
+			payment_schedule.outstanding.as_("term_outstanding"),
+			an.Sum(portion).over(invoice.name).as_("total_portion"),
+			an.Sum(portion).over(invoice.name).orderby(*term_order).as_("portion_until_term"),
+			an.Sum(payment_schedule.outstanding).over(invoice.name).as_("terms_outstanding"),
+			an.Sum(payment_schedule.paid_amount).over(invoice.name).as_("terms_paid"),
+			an.RowNumber().over(invoice.name).orderby(*term_order).as_("term"),
+		)
+		.where(invoice.docstatus == 1)
+		.where(invoice.outstanding_amount != 0)
+	)
+
+	if company:
+		terms = terms.where(invoice.company == company)
+
+	if apply_payment_delays:
+		terms = (
+			terms.left_join(payment_delay)
+			.on(
+				(payment_delay.party_type == party_type)
+				& (payment_delay.party == invoice[party_field])
+			)
+			.select(AddDate(due_date, Coalesce(payment_delay.delay, 0)).as_("posting_date"))
+		)
+	else:
+		terms = terms.select(due_date.as_("posting_date"))
+
+	share = terms.portion / terms.total_portion
+	later_terms = (1 - terms.portion_until_term / terms.total_portion) * terms.grand_total
+	unpaid = Greatest(terms.outstanding_amount - later_terms, 0)
+	amount = (
+		Case()
+		# Credit notes and overpaid invoices
+		.when(terms.outstanding_amount < 0, terms.outstanding_amount * share)
+		.when(
+			(terms.terms_paid > 0) & (terms.terms_outstanding > 0),
+			terms.outstanding_amount * terms.term_outstanding / terms.terms_outstanding,
+		)
+		# The first term also takes any rounding difference
+		.when(terms.term == 1, unpaid)
+		.else_(Least(unpaid, share * terms.grand_total))
+	)
+
+	posting_date = terms.posting_date
+	if overdue_date:
+		posting_date = Date(Greatest(posting_date, overdue_date))
+
+	return frappe.qb.from_(terms).select(
+		terms.name,
+		terms.company,
+		terms.party,
+		posting_date.as_("posting_date"),
+		terms.currency,
+		amount.as_("amount"),
+	)
+
+
+def get_expense_claims(company=None):
+	"""Return a query of the claimed amounts of the expense claims, in the company currency."""
+	expense_claim = frappe.qb.DocType("Expense Claim")
+	company_table = frappe.qb.DocType("Company")
+
+	query = (
+		frappe.qb.from_(expense_claim)
+		.join(company_table)
+		.on(company_table.name == expense_claim.company)
+		.select(
+			expense_claim.name,
+			expense_claim.company,
+			expense_claim.employee.as_("party"),
+			expense_claim.posting_date,
+			company_table.default_currency.as_("currency"),
+			expense_claim.total_claimed_amount.as_("amount"),
+		)
+		.where(expense_claim.status.notin(["Rejected", "Cancelled"]))
+	)
+
+	if company:
+		query = query.where(expense_claim.company == company)
+
+	return query